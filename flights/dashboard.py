@@ -1,34 +1,60 @@
+import os
+from datetime import datetime
+from pathlib import Path
 from django.conf import settings
-from .services.ObtenerVuelos import main as obtener_vuelos
-from .services.Procesar import procesar_datos
-from .services.Clean import filtrar_region_antofagasta
+from .services.Pipeline import PipelineVuelos
+from .services.Perfilado import PerfilEjecucion
 
-def run_etl():
+def replay_paths(output_dir=None) -> dict:
+    """
+    Rutas de salida de un replay. Nunca son las de producción: por defecto se
+    crea `REPLAY_DIR/<fecha>/`; si se indica `output_dir` debe estar vacío,
+    porque un histórico existente descartaría todo el replay como duplicado.
+    """
+    salida = Path(output_dir or Path(settings.REPLAY_DIR) / f"{datetime.now():%Y%m%dT%H%M%S}")
+    if salida.exists() and any(salida.iterdir()):
+        raise ValueError(f"La carpeta de replay {salida} no está vacía")
+    salida.mkdir(parents=True, exist_ok=True)
+    return {
+        "historico": salida / os.path.basename(settings.PARQUET_HISTORICO),
+        "final": salida / os.path.basename(settings.PARQUET_FINAL),
+        "quarantine": salida / os.path.basename(settings.PARQUET_QUARANTINE),
+        "grid": salida / os.path.basename(settings.PARQUET_GRID),
+    }
+
+
+def run_etl(replay=False, profile=False, output_dir=None):
     """
     Ejecuta la secuencia completa de ETL y procesamiento.
+    Con `replay=True` usa solo las páginas de la API guardadas en caché y
+    escribe en una carpeta aparte (ver `replay_paths`), nunca en producción.
+    Con `profile=True` deja un reporte de cProfile/tracemalloc en PROFILE_DIR.
     """
-    # 1) Obtener y guardar vuelos crudos
-    new_tbl, df_new, stats = obtener_vuelos(
+    if replay:
+        rutas = replay_paths(output_dir)
+    else:
+        rutas = {
+            "historico": settings.PARQUET_HISTORICO,
+            "final": settings.PARQUET_FINAL,
+            "quarantine": settings.PARQUET_QUARANTINE,
+            "grid": settings.PARQUET_GRID,
+        }
+    # El batch viaja en memoria (Arrow) entre etapas:
+    # obtener ➜ aplanar ➜ validar ➜ clasificar región ➜ procesar
+    pipeline = PipelineVuelos(
         settings.JSON_CONFIG,
-        settings.PARQUET_HISTORICO,
-        settings.PARQUET_API,
+        rutas["historico"],
+        rutas["final"],
+        rutas["quarantine"],
+        rutas["grid"],
+        telemetry_dir=None if replay else settings.TELEMETRY_DIR,
+        # flights_api.parquet solo se escribe como checkpoint de depuración
+        checkpoint=settings.PARQUET_API if settings.ETL_CHECKPOINT and not replay else None,
+        cache_dir=settings.API_CACHE_DIR,
+        replay=replay,
+        perfil=PerfilEjecucion(settings.PROFILE_DIR) if profile else None,
     )
-    # 'df_new' contiene las columnas limpias del batch recien descargado
-    records = df_new.to_dict("records") if not df_new.empty else []
-    kept, discarded = filtrar_region_antofagasta(records)
-    print(
-        f"Nuevos vuelos: {new_tbl.num_rows} | "
-        f"En Antofagasta: {len(kept)} | "
-        f"Descartados fuera de la región: {len(discarded)}"
-    )
-
-    # 2) Procesamiento y escritura final
-    procesar_datos(settings.PARQUET_API, settings.PARQUET_FINAL)
-
-    return {
-        "fetched": new_tbl.num_rows,
-        "kept": len(kept),
-        "discarded": len(discarded),
-        "api_total": stats.get("total") if isinstance(stats, dict) else None,
-        "range": stats.get("requested_range") if isinstance(stats, dict) else None,
-    }
\ No newline at end of file
+    resultado = pipeline.ejecutar()
+    if replay:
+        resultado["output_dir"] = str(Path(rutas["final"]).parent)
+    return resultado
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from flights.services.ObtenerVuelos import cuenta_legado, load_json
+from flights.services.Reprocesar import reprocesar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye FlightsFinal desde el histórico RAW completo en paralelo "
+        "(usar cuando cambian las reglas de derivación)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Procesos a usar (por defecto, todos los núcleos).",
+        )
+
+    def handle(self, *args, **options):
+        cfg = load_json(settings.JSON_CONFIG, {})
+        try:
+            stats = reprocesar(
+                settings.PARQUET_HISTORICO,
+                settings.PARQUET_FINAL,
+                settings.PARQUET_GRID,
+                workers=options["workers"],
+                default_account=cfg.get("name", "default"),
+                # Con `accounts` el histórico antiguo se migra a la misma cuenta que en el ETL
+                legacy_account=cuenta_legado(cfg),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for pid, w in sorted(stats["per_worker"].items()):
+            self.stdout.write(
+                f"  proceso {pid}: {w['fragments']} fragmentos | "
+                f"{w['rows']} filas | {w['rows_per_second']:.0f} filas/s"
+            )
+        self.stdout.write(
+            f"Validación: {stats['validation']} | "
+            f"Antofagasta: {stats['kept']} | Fuera: {stats['discarded']} | "
+            f"Repetidos omitidos: {stats['duplicates']}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Reproceso completo: {stats['rows_in']} filas RAW ➜ "
+            f"{stats['rows_out']} filas en FlightsFinal "
+            f"({stats['fragments']} fragmentos, {stats['workers']} procesos) en "
+            f"{stats['seconds']:.1f}s | "
+            f"{stats['rows_per_second_per_core']:.0f} filas/s por núcleo"
+        ))
@@ -0,0 +1,193 @@
+# El objetivo principal de este script es guardar en disco las páginas que
+# devuelve la API de AirData para no volver a pedir ventanas ya descargadas y
+# poder repetir el ETL completo sin red (modo replay).
+import gzip
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+# Una ventana se considera cerrada (no llegarán más vuelos) pasado este tiempo
+VENTANA_CERRADA = timedelta(days=7)
+MAX_BYTES = 512 * 1024 * 1024
+# Al desalojar se baja hasta esta fracción de `max_bytes` para que un recorrido
+# del disco deje espacio a muchas escrituras (y no solo a la siguiente)
+NIVEL_DESALOJO = 0.9
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+
+
+class CachePaginas:
+    """
+    Caché direccionada por contenido de las páginas de `fetch_flights`.
+
+    • La clave es el SHA-256 de (url, consulta normalizada, offset, limit).
+    • Cada página se guarda comprimida con gzip en `<dir>/pages/ab/<clave>.json.gz`.
+    • Las ventanas cerradas (fin anterior a `ventana_cerrada`) se sirven
+      siempre desde la caché; las ventanas abiertas se guardan pero en modo
+      normal se vuelven a pedir a la API.
+    • Si el tamaño total supera `max_bytes` se eliminan las páginas usadas
+      hace más tiempo (LRU por fecha de modificación) hasta bajar a
+      `NIVEL_DESALOJO` de `max_bytes`.
+    • `ventanas` divide una consulta en días cerrados (claves estables entre
+      ejecuciones) y un tramo final abierto.
+    • Cada consulta completa se anota en `<dir>/index/<cuenta>.jsonl` para
+      poder repetirla en modo replay.
+    """
+
+    def __init__(
+        self,
+        directorio,
+        max_bytes: int = MAX_BYTES,
+        ventana_cerrada: timedelta = VENTANA_CERRADA,
+        replay: bool = False,
+    ):
+        self.directorio = os.fspath(directorio)
+        self.max_bytes = max_bytes
+        self.ventana_cerrada = ventana_cerrada
+        self.replay = replay
+        self._lock = threading.Lock()
+        self._total = sum(os.path.getsize(p) for p in self._paginas())
+
+    # --- Claves y rutas ---
+
+    @staticmethod
+    def clave(url: str, query: dict, offset: int, limit: int) -> str:
+        normalizada = {k: "" if v is None else str(v) for k, v in sorted(query.items())}
+        texto = json.dumps(
+            {"url": url, "query": normalizada, "offset": offset, "limit": limit},
+            sort_keys=True,
+        )
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, "pages", clave[:2], f"{clave}.json.gz")
+
+    def _paginas(self):
+        for raiz, _, archivos in os.walk(os.path.join(self.directorio, "pages")):
+            for nombre in archivos:
+                if nombre.endswith(".json.gz"):
+                    yield os.path.join(raiz, nombre)
+
+    def es_cerrada(self, query: dict) -> bool:
+        """True si la ventana de la consulta terminó hace más de `ventana_cerrada`."""
+        try:
+            fin = datetime.strptime(query.get("end") or "", FORMATO_FECHA)
+        except ValueError:
+            return False
+        return fin <= datetime.now() - self.ventana_cerrada
+
+    def ventanas(self, inicio: str | None, fin: str) -> list[tuple]:
+        """
+        Divide el rango (inicio, fin) en días completos ya cerrados y un tramo
+        final abierto, como lista de (start, end).
+
+        Los días van de 00:00:00 a 00:00:00 del día siguiente, así la misma
+        ventana tiene la misma clave en cada ejecución y se sirve desde la
+        caché. Sin `inicio` el tramo cerrado es una sola ventana (None, corte).
+        Los vuelos anteriores a `inicio` que traiga el primer día se descartan
+        luego como duplicados del histórico.
+        """
+        dia = timedelta(days=1)
+        fin_dt = datetime.strptime(fin, FORMATO_FECHA)
+        corte = datetime.now() - self.ventana_cerrada
+        corte = min(corte, fin_dt).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        cerradas = []
+        if inicio is None:
+            cerradas.append((None, corte.strftime(FORMATO_FECHA)))
+        else:
+            desde = datetime.strptime(inicio, FORMATO_FECHA).replace(hour=0, minute=0, second=0)
+            while desde + dia <= corte:
+                cerradas.append((desde.strftime(FORMATO_FECHA), (desde + dia).strftime(FORMATO_FECHA)))
+                desde += dia
+        if not cerradas:
+            return [(inicio, fin)]
+        return cerradas + [(cerradas[-1][1], fin)]
+
+    # --- Lectura / escritura de páginas ---
+
+    def obtener(self, url: str, query: dict, offset: int, limit: int) -> dict | None:
+        """Página guardada o None (también None para ventanas abiertas fuera de replay)."""
+        if not self.replay and not self.es_cerrada(query):
+            return None
+        ruta = self._ruta(self.clave(url, query, offset, limit))
+        try:
+            with gzip.open(ruta, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(ruta)                    # marca de uso para el LRU
+        except OSError:
+            pass
+        return payload
+
+    def guardar(self, url: str, query: dict, offset: int, limit: int, payload: dict):
+        ruta = self._ruta(self.clave(url, query, offset, limit))
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        tmp = f"{ruta}.{uuid.uuid4().hex[:8]}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(payload, f)
+        previo = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+        os.replace(tmp, ruta)
+        with self._lock:
+            self._total += os.path.getsize(ruta) - previo
+            if self._total > self.max_bytes:
+                self._desalojar()
+
+    def _desalojar(self):
+        """Elimina las páginas menos usadas hasta quedar bajo `NIVEL_DESALOJO` de `max_bytes`."""
+        paginas = sorted(
+            ((os.path.getmtime(p), os.path.getsize(p), p) for p in self._paginas()),
+        )
+        self._total = sum(tam for _, tam, _ in paginas)
+        objetivo = self.max_bytes * NIVEL_DESALOJO
+        for _, tam, ruta in paginas:
+            if self._total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+                self._total -= tam
+            except OSError:
+                pass
+
+    # --- Índice de consultas para replay ---
+
+    def _indice(self, cuenta: str) -> str:
+        return os.path.join(self.directorio, "index", f"{cuenta}.jsonl")
+
+    def registrar_consulta(self, cuenta: str, query: dict):
+        """Anota una consulta descargada completa (todas sus páginas en caché)."""
+        ruta = self._indice(cuenta)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        linea = json.dumps({"query": query, "recorded_at": datetime.now().isoformat(timespec="seconds")})
+        with self._lock, open(ruta, "a", encoding="utf-8") as f:
+            f.write(linea + "\n")
+
+    def consultas(self, cuenta: str) -> list[dict]:
+        """Consultas registradas de una cuenta, en el orden en que se hicieron."""
+        try:
+            with open(self._indice(cuenta), "r", encoding="utf-8") as f:
+                return [json.loads(linea)["query"] for linea in f if linea.strip()]
+        except FileNotFoundError:
+            return []
+
+
+def cache_desde_config(cfg: dict, directorio, replay: bool = False) -> CachePaginas | None:
+    """
+    Crea la caché con las opciones de `cfg["cache"]`:
+    • enabled           ➜ False la desactiva (salvo en replay).
+    • max_mb            ➜ tamaño máximo en MB (por defecto 512).
+    • closed_after_days ➜ días tras los cuales una ventana se da por cerrada (7).
+    """
+    opciones = cfg.get("cache", {})
+    if directorio is None or (not opciones.get("enabled", True) and not replay):
+        return None
+    return CachePaginas(
+        directorio,
+        max_bytes=int(opciones.get("max_mb", MAX_BYTES // (1024 * 1024)) * 1024 * 1024),
+        ventana_cerrada=timedelta(days=opciones.get("closed_after_days", VENTANA_CERRADA.days)),
+        replay=replay,
+    )
@@ -2,6 +2,8 @@
 # Y descartar registros que cumplan con ciertas condiciones.
 # Vuelos que esten fuera de la region de antofagasta
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from typing import Optional, Tuple
 from pathlib import Path
 def count_and_prune_duplicates(
@@ -56,27 +58,26 @@ def count_and_prune_duplicates(
 LAT_MIN, LAT_MAX = -26.5, -21.75   # sur / norte
 LON_MIN, LON_MAX = -71.5, -67.0    # oeste / este
 
-def filtrar_region_antofagasta(records):
+def clasificar_region_tabla(tbl: pa.Table) -> Tuple[pa.Table, pa.Table]:
     """
-    Devuelve (kept_df, discarded_df) con los vuelos
-    dentro / fuera de la Región de Antofagasta.
-
-    Columnas esperadas: 'Longitud' y 'Latitude' (float).
+    Devuelve (kept, discarded) con los vuelos dentro / fuera de la Región de
+    Antofagasta (límites LAT_MIN..LAT_MAX, LON_MIN..LON_MAX) como tablas Arrow
+    filtradas. Las coordenadas nulas quedan fuera.
     """
-    df = pd.DataFrame(records).copy()
-    if df.empty:
+    if tbl.num_rows == 0:
         print("Antofagasta \u2713 0 | Fuera \u2717 0")
-        return pd.DataFrame(), pd.DataFrame()
-    # nos aseguramos de que sean numéricos
-    df['Longitud'] = pd.to_numeric(df['Longitud'], errors='coerce')
-    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
-
-    mask = (
-        df['Latitude'].between(LAT_MIN, LAT_MAX)
-        & df['Longitud'].between(LON_MIN, LON_MAX)
+        return tbl, tbl
+    lat = pc.cast(tbl["Latitude"], pa.float64())
+    lon = pc.cast(tbl["Longitud"], pa.float64())
+    mask = pc.fill_null(
+        pc.and_kleene(
+            pc.and_kleene(pc.greater_equal(lat, LAT_MIN), pc.less_equal(lat, LAT_MAX)),
+            pc.and_kleene(pc.greater_equal(lon, LON_MIN), pc.less_equal(lon, LON_MAX)),
+        ),
+        False,
     )
-    kept      = df[mask]
-    discarded = df[~mask]
+    kept      = tbl.filter(mask)
+    discarded = tbl.filter(pc.invert(mask))
 
-    print(f"Antofagasta ✓ {len(kept)} | Fuera ✗ {len(discarded)}")
+    print(f"Antofagasta ✓ {kept.num_rows} | Fuera ✗ {discarded.num_rows}")
     return kept, discarded
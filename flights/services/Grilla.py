@@ -0,0 +1,154 @@
+# El objetivo principal de este script es precalcular una grilla de zonas de
+# operación: cada vuelo procesado se asigna a celdas de tamaño fijo en varios
+# niveles de zoom y se acumulan vuelos y horas de aire por celda.
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .Snapshots import publicar_snapshot, snapshot_actual
+from .Metricas import registrar_bytes
+
+# Tamaño de celda (metros, Web Mercator) por nivel de zoom
+ZOOM_CELDA_M = {
+    6: 16_000,
+    8: 4_000,
+    10: 1_000,
+    12: 250,
+}
+
+RADIO_TIERRA = 6_378_137.0
+# Límite de latitud de Web Mercator; en ±90° la proyección es infinita
+LAT_MAX_MERCATOR = 85.0511
+COLUMNAS = ["zoom", "cx", "cy", "flights", "air_hours"]
+
+
+def proyectar(lon: np.ndarray, lat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Proyecta lon/lat (grados) a Web Mercator (EPSG:3857, metros).
+    Las latitudes se acotan a ±`LAT_MAX_MERCATOR` (p. ej. un bbox de todo el mundo).
+    """
+    lat = np.clip(lat, -LAT_MAX_MERCATOR, LAT_MAX_MERCATOR)
+    x = RADIO_TIERRA * np.radians(lon)
+    y = RADIO_TIERRA * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return x, y
+
+
+def agregar_grilla(df: pd.DataFrame, niveles: dict = ZOOM_CELDA_M) -> pd.DataFrame:
+    """
+    Agrupa un lote de vuelos procesados en celdas por nivel de zoom.
+
+    Columnas esperadas: 'Longitud', 'Latitude' y 'Air Seconds'. Las horas se
+    calculan desde los segundos sin redondear ('Air Hours' viene redondeada a
+    2 decimales por vuelo y sumarla infla los vuelos cortos); 'Air Hours' solo
+    se usa si no hay segundos. El redondeo se hace al servir (`celdas_zoom`).
+    Devuelve un DataFrame con `COLUMNAS`, una fila por (zoom, cx, cy).
+    """
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS)
+
+    lon = pd.to_numeric(df["Longitud"], errors="coerce").to_numpy(dtype="float64")
+    lat = pd.to_numeric(df["Latitude"], errors="coerce").to_numpy(dtype="float64")
+    if "Air Seconds" in df:
+        horas = pd.to_numeric(df["Air Seconds"], errors="coerce") / 3600
+    else:
+        horas = pd.to_numeric(df["Air Hours"], errors="coerce")
+    horas = horas.fillna(0).to_numpy(dtype="float64")
+    ok = ~(np.isnan(lon) | np.isnan(lat))
+    x, y = proyectar(lon[ok], lat[ok])
+    horas = horas[ok]
+
+    partes = []
+    for zoom, celda in niveles.items():
+        partes.append(pd.DataFrame({
+            "zoom": np.full(len(x), zoom, dtype="int8"),
+            "cx": np.floor_divide(x, celda).astype("int32"),
+            "cy": np.floor_divide(y, celda).astype("int32"),
+            "flights": np.ones(len(x), dtype="int64"),
+            "air_hours": horas,
+        }))
+    lote = pd.concat(partes, ignore_index=True)
+    return lote.groupby(["zoom", "cx", "cy"], as_index=False)[["flights", "air_hours"]].sum()
+
+
+def actualizar_grilla(
+    df_batch: pd.DataFrame,
+    grid_parquet: str,
+    reconstruir: bool = False,
+) -> pd.DataFrame:
+    """
+    Suma el lote nuevo a la grilla acumulada y publica un snapshot de `grid_parquet`.
+    Con `reconstruir=True` se descarta la grilla previa (reproceso completo).
+    Devuelve la grilla completa.
+    """
+    nuevo = agregar_grilla(df_batch)
+    partes = [nuevo]
+    snapshot = None if reconstruir else snapshot_actual(grid_parquet)
+    if snapshot is not None:
+        registrar_bytes(leidos=os.path.getsize(snapshot))
+        partes.insert(0, pd.read_parquet(snapshot, engine="pyarrow"))
+    if nuevo.empty and not reconstruir:
+        return partes[0]
+    return publicar_grilla(combinar_grilla(partes), grid_parquet)
+
+
+def combinar_grilla(partes: list[pd.DataFrame]) -> pd.DataFrame:
+    """Suma agregados parciales (`agregar_grilla`) por celda."""
+    partes = [p for p in partes if not p.empty] or [pd.DataFrame(columns=COLUMNAS)]
+    return (
+        pd.concat(partes, ignore_index=True)
+        .groupby(["zoom", "cx", "cy"], as_index=False)[["flights", "air_hours"]]
+        .sum()
+        .astype({"zoom": "int8", "cx": "int32", "cy": "int32", "flights": "int64"})
+    )
+
+
+def publicar_grilla(grilla: pd.DataFrame, grid_parquet: str) -> pd.DataFrame:
+    """Publica la grilla completa como snapshot nuevo de `grid_parquet`."""
+    tbl = pa.Table.from_pandas(grilla, preserve_index=False)
+    publicar_snapshot(
+        lambda destino: pq.write_table(tbl, destino, compression="zstd"),
+        grid_parquet,
+    )
+    return grilla
+
+
+def celdas_zoom(grid_parquet: str, zoom: int, bbox=None) -> dict:
+    """
+    Tile JSON compacto con las celdas de un nivel de zoom.
+
+    Parameters
+    ----------
+    bbox : tuple(lon_min, lat_min, lon_max, lat_max) | None
+        Limita las celdas a las que intersectan el recuadro.
+
+    Returns
+    -------
+    dict con `zoom`, `cell_size` (metros, EPSG:3857) y `cells` como lista de
+    [cx, cy, vuelos, horas de aire]. La esquina inferior izquierda de una
+    celda es (cx * cell_size, cy * cell_size).
+    """
+    celda = ZOOM_CELDA_M[zoom]
+    tile = {"zoom": zoom, "cell_size": celda, "cells": []}
+    snapshot = snapshot_actual(grid_parquet)
+    if snapshot is None:
+        return tile
+
+    filtros = [("zoom", "=", zoom)]
+    if bbox is not None:
+        (x0, x1), (y0, y1) = proyectar(np.array(bbox[0::2]), np.array(bbox[1::2]))
+        filtros += [
+            ("cx", ">=", int(x0 // celda)), ("cx", "<=", int(x1 // celda)),
+            ("cy", ">=", int(y0 // celda)), ("cy", "<=", int(y1 // celda)),
+        ]
+    tbl = pq.read_table(snapshot, filters=filtros)
+    tile["cells"] = [
+        [cx, cy, n, round(h, 2)]
+        for cx, cy, n, h in zip(
+            tbl["cx"].to_pylist(),
+            tbl["cy"].to_pylist(),
+            tbl["flights"].to_pylist(),
+            tbl["air_hours"].to_pylist(),
+        )
+    ]
+    return tile
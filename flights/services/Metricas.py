@@ -0,0 +1,204 @@
+# El objetivo principal de este script es instrumentar el ETL y las vistas:
+# duración, filas y bytes por etapa, latencia de cada página de la API,
+# reintentos, memoria pico y latencia de las vistas. Las métricas se exponen en
+# formato texto de Prometheus y cada ejecución del ETL deja una línea JSON en el log.
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:                          # Windows
+    resource = None
+
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_ETAPA = (0.1, 0.5, 1, 5, 15, 30, 60, 300, 900)
+
+
+class Registro:
+    """Registro en memoria de contadores, gauges e histogramas con etiquetas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}          # nombre -> (tipo, ayuda, buckets)
+        self._valores = {}       # (nombre, etiquetas) -> float | [buckets..., suma, conteo]
+
+    def describir(self, nombre: str, tipo: str, ayuda: str, buckets=None):
+        self._meta[nombre] = (tipo, ayuda, tuple(buckets or ()))
+
+    def incrementar(self, nombre: str, valor: float = 1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def fijar(self, nombre: str, valor: float, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._valores[clave] = valor
+
+    def observar(self, nombre: str, valor: float, **etiquetas):
+        buckets = self._meta[nombre][2]
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            datos = self._valores.setdefault(clave, [0] * len(buckets) + [0.0, 0])
+            for i, limite in enumerate(buckets):
+                if valor <= limite:
+                    datos[i] += 1
+            datos[-2] += valor
+            datos[-1] += 1
+
+    def exportar_prometheus(self) -> str:
+        """Texto en el formato de exposición de Prometheus (0.0.4)."""
+        with self._lock:
+            valores = {k: (list(v) if isinstance(v, list) else v) for k, v in self._valores.items()}
+        lineas = []
+        for nombre, (tipo, ayuda, buckets) in sorted(self._meta.items()):
+            series = sorted((k[1], v) for k, v in valores.items() if k[0] == nombre)
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etiquetas, valor in series:
+                if tipo != "histogram":
+                    lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+                    continue
+                for limite, n in zip(buckets, valor):
+                    lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, le=_numero(limite))} {n}")
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, le='+Inf')} {valor[-1]}")
+                lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_numero(valor[-2])}")
+                lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {valor[-1]}")
+        return "\n".join(lineas) + "\n"
+
+
+def exportar_archivo(ruta, registro: Registro | None = None):
+    """
+    Escribe las métricas en `ruta` de forma atómica (formato del textfile
+    collector de node_exporter). Lo usan las ejecuciones por línea de
+    comandos, cuyo registro no es el del servidor web que atiende /metrics.
+    """
+    ruta = os.fspath(ruta)
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write((registro or REGISTRO).exportar_prometheus())
+    os.replace(tmp, ruta)
+
+
+def _numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _etiquetas(etiquetas, **extra) -> str:
+    pares = list(etiquetas) + list(extra.items())
+    if not pares:
+        return ""
+    escapar = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in pares) + "}"
+
+
+REGISTRO = Registro()
+REGISTRO.describir("rommex_etl_runs_total", "counter", "Ejecuciones del ETL por resultado.")
+REGISTRO.describir("rommex_etl_last_run_timestamp_seconds", "gauge", "Fin de la última ejecución del ETL (epoch).")
+REGISTRO.describir("rommex_etl_stage_duration_seconds", "histogram", "Duración de cada etapa del ETL.", BUCKETS_ETAPA)
+REGISTRO.describir("rommex_etl_stage_rows_in_total", "counter", "Filas que entran a cada etapa.")
+REGISTRO.describir("rommex_etl_stage_rows_out_total", "counter", "Filas que salen de cada etapa.")
+REGISTRO.describir("rommex_etl_stage_bytes_read_total", "counter", "Bytes leídos (red y disco) por etapa.")
+REGISTRO.describir("rommex_etl_stage_bytes_written_total", "counter", "Bytes escritos a disco por etapa.")
+REGISTRO.describir("rommex_process_peak_memory_bytes", "gauge", "Memoria residente pico del proceso desde que arrancó.")
+REGISTRO.describir("rommex_airdata_page_latency_seconds", "histogram", "Latencia de cada página pedida a AirData.", BUCKETS_LATENCIA)
+REGISTRO.describir("rommex_airdata_retries_total", "counter", "Reintentos de páginas de AirData.")
+REGISTRO.describir("rommex_http_request_duration_seconds", "histogram", "Latencia de las vistas instrumentadas.", BUCKETS_LATENCIA)
+
+
+def memoria_pico() -> int | None:
+    """
+    Memoria residente pico del proceso en bytes desde que arrancó (None si no
+    está disponible). No se reinicia por etapa: en el servidor web es el
+    máximo de toda la vida del proceso.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+# Etapa en curso de esta ejecución. Es una variable de contexto: dos ETL en
+# paralelo (dos peticiones a refresh) no se mezclan, y los hilos de
+# `EjecutorHilos` heredan la etapa de quien les envía la tarea.
+_etapa_actual: contextvars.ContextVar = contextvars.ContextVar("etapa_actual", default=None)
+_bytes_lock = threading.Lock()
+
+# Envoltura opcional de cada tarea de `EjecutorHilos` (la usa el perfilado)
+envoltura_tareas: contextvars.ContextVar = contextvars.ContextVar("envoltura_tareas", default=None)
+
+
+class EjecutorHilos(ThreadPoolExecutor):
+    """
+    `ThreadPoolExecutor` cuyas tareas corren en una copia del contexto de
+    quien las envía, para que la etapa en curso (y su perfil, si lo hay) siga
+    aplicando dentro de los hilos del pool.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        contexto = contextvars.copy_context()
+        envoltura = contexto.get(envoltura_tareas)
+        if envoltura is not None:
+            fn = envoltura(fn)
+        return super().submit(contexto.run, fn, *args, **kwargs)
+
+
+def registrar_bytes(leidos: int = 0, escritos: int = 0):
+    """Suma bytes a la etapa en curso del contexto (se puede llamar desde cualquier hilo)."""
+    datos = _etapa_actual.get()
+    if datos is None:
+        return
+    with _bytes_lock:
+        datos["bytes_read"] += leidos
+        datos["bytes_written"] += escritos
+
+
+@contextmanager
+def medir_etapa(nombre: str):
+    """
+    Mide una etapa del ETL. El bloque puede completar `rows_in` y `rows_out`
+    en el dict que se entrega; los bytes llegan vía `registrar_bytes`.
+    `process_peak_memory_bytes` es el pico del proceso al terminar la etapa,
+    no el consumo de la etapa.
+    """
+    datos = {"stage": nombre, "rows_in": 0, "rows_out": 0, "bytes_read": 0, "bytes_written": 0}
+    token = _etapa_actual.set(datos)
+    inicio = time.perf_counter()
+    try:
+        yield datos
+    finally:
+        datos["duration_seconds"] = round(time.perf_counter() - inicio, 6)
+        datos["process_peak_memory_bytes"] = memoria_pico()
+        _etapa_actual.reset(token)
+
+        REGISTRO.observar("rommex_etl_stage_duration_seconds", datos["duration_seconds"], stage=nombre)
+        REGISTRO.incrementar("rommex_etl_stage_rows_in_total", datos["rows_in"], stage=nombre)
+        REGISTRO.incrementar("rommex_etl_stage_rows_out_total", datos["rows_out"], stage=nombre)
+        REGISTRO.incrementar("rommex_etl_stage_bytes_read_total", datos["bytes_read"], stage=nombre)
+        REGISTRO.incrementar("rommex_etl_stage_bytes_written_total", datos["bytes_written"], stage=nombre)
+        if datos["process_peak_memory_bytes"] is not None:
+            REGISTRO.fijar("rommex_process_peak_memory_bytes", datos["process_peak_memory_bytes"])
+
+
+def medir_vista(nombre: str):
+    """Decorador que registra la latencia de una vista en el histograma HTTP."""
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return vista(*args, **kwargs)
+            finally:
+                REGISTRO.observar(
+                    "rommex_http_request_duration_seconds",
+                    time.perf_counter() - inicio,
+                    view=nombre,
+                )
+        return envoltura
+    return decorador
@@ -1,12 +1,23 @@
 import json
 import os
+import shutil
+import threading
+import time
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import pyarrow.dataset as ds
 import pyarrow.compute as pc
 import pyarrow.parquet as pq
 import pyarrow as pa  
+from .Telemetria import fetch_telemetry
+from .Snapshots import publicar_snapshot, snapshot_actual
+from .Cache import CachePaginas
+from .Metricas import REGISTRO, EjecutorHilos, registrar_bytes
+# Filas por row group del RAW; el reproceso reparte el histórico por row groups
+FILAS_POR_GRUPO = 10_000
+
 # --- Funciones auxiliares ---
 
 
@@ -24,10 +35,11 @@ def get_last_flight_timestamp(path: str) -> str | None:
 
     """Return the last timestamp from parrot file in format 'YYYY-MM-DD+HH:MM:SS' or ``None`` if unavailable."""
     try:
-        if not os.path.exists(path) or os.path.getsize(path) == 0:
+        snapshot = snapshot_actual(path)
+        if snapshot is None:
             return None
         
-        dataset = ds.dataset(path, format="parquet")
+        dataset = ds.dataset(snapshot, format="parquet")
         max_time: datetime | None = None
         for times in dataset.to_batches(columns=["time"]):
             #print (times)
@@ -48,32 +60,107 @@ def get_now_timestamp():
     now = datetime.now()
     return now.strftime("%Y-%m-%d %H:%M:%S")
 
-def fetch_flights(query: dict, cfg: dict):
-    url   = "https://api.airdata.com/flights"
-    limit = 100
+class LimiteTasa:
+    """
+    Limita la cantidad de peticiones por segundo de una cuenta.
+    Es seguro entre hilos: cada llamada a `esperar` reserva el siguiente turno.
+    """
+
+    def __init__(self, por_segundo: float | None = None):
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0.0
+        self._lock = threading.Lock()
+        self._proximo = 0.0
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            espera = self._proximo - ahora
+            self._proximo = max(ahora, self._proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+def get_with_retries(session, url: str, params: dict, cfg: dict, limite=None, stats=None):
+    """
+    GET de una página con reintentos ante errores de red, 429 y 5xx
+    (`cfg["max_retries"]`, 2 por defecto, con espera exponencial).
+    Registra la latencia de cada intento y los reintentos en las métricas.
+    """
+    reintentos = cfg.get("max_retries", 2)
+    cuenta = cfg.get("name", "default")
+    for intento in range(reintentos + 1):
+        if limite is not None:
+            limite.esperar()
+        inicio = time.perf_counter()
+        try:
+            resp = session.get(url, params=params, timeout=15)
+            transitorio = resp.status_code == 429 or resp.status_code >= 500
+        except (requests.ConnectionError, requests.Timeout):
+            if intento == reintentos:
+                raise
+            transitorio = True
+        finally:
+            REGISTRO.observar(
+                "rommex_airdata_page_latency_seconds",
+                time.perf_counter() - inicio,
+                account=cuenta,
+            )
+        if not transitorio or intento == reintentos:
+            resp.raise_for_status()
+            registrar_bytes(leidos=len(resp.content))
+            return resp
+        REGISTRO.incrementar("rommex_airdata_retries_total", account=cuenta)
+        if stats is not None:
+            stats["retries"] = stats.get("retries", 0) + 1
+        time.sleep(0.5 * 2 ** intento)
+
+
+def fetch_flights(
+    query: dict,
+    cfg: dict,
+    limite: LimiteTasa | None = None,
+    cache: CachePaginas | None = None,
+):
+    url   = cfg.get("base_url", "https://api.airdata.com").rstrip("/") + cfg.get("endpoint", "/flights")
+    limit = cfg.get("page_size", 100)
 
     try:
         with requests.Session() as session:
             session.auth    = (cfg["api_key"], "")
             session.headers.update({"Content-Type": "application/json"})
 
-            vuelos, offset = [], 0
+            vuelos, offset, descargadas = [], 0, 0
+            http = {"pages": 0, "retries": 0}
             while True:
-                resp = session.get(
-                    url,
-                    params={**query, "limit": limit, "offset": offset},
-                    timeout=15
-                )
-                resp.raise_for_status()
-
-                payload = resp.json()
+                payload = cache.obtener(url, query, offset, limit) if cache is not None else None
+                if payload is None:
+                    if cache is not None and cache.replay:
+                        raise LookupError(f"página offset={offset} no está en la caché")
+                    resp = get_with_retries(
+                        session,
+                        url,
+                        {**query, "limit": limit, "offset": offset},
+                        cfg,
+                        limite,
+                        http,
+                    )
+                    payload = resp.json()
+                    descargadas += 1
+                    if cache is not None:
+                        cache.guardar(url, query, offset, limit, payload)
                 vuelos.extend(payload.get("data", []))
+                http["pages"] += 1
 
                 if not payload.get("moreResultsAvailable"):
+                    if cache is not None and descargadas:
+                        cache.registrar_consulta(cfg.get("name", "default"), query)
                     stats = {
                         "requested_range": (query.get("start"), query.get("end")),
                         "total": len(vuelos),
                         "fetched_at": datetime.now().isoformat(timespec="seconds"),
+                        **http,
                     }
                     return vuelos, stats
 
@@ -88,6 +175,7 @@ def save_raw_parquet_pa(
     parquet_path: str,
     id_field: str = "id",
     compression: str = "zstd",
+    row_group_size: int = FILAS_POR_GRUPO,
     )  -> pa.Table:
     """
     Guarda el histórico RAW en formato Parquet usando PyArrow puro.
@@ -97,11 +185,13 @@ def save_raw_parquet_pa(
     vuelos       : list[dict]
         Payload crudo de la API.
     parquet_path  : str
-        Ruta al archivo Parquet.
+        Ruta lógica del archivo Parquet (se publica como snapshot).
     id_field      : str, default "id"
         Nombre de la columna que identifica unívocamente cada vuelo.
     compression   : str, default "zstd"
         Codec de compresión al re-escribir el archivo.
+    row_group_size : int, default FILAS_POR_GRUPO
+        Filas por row group; permite reprocesar el histórico por partes.
 
     Returns
     -------
@@ -116,34 +206,49 @@ def save_raw_parquet_pa(
         raise ValueError(f"'{id_field}' no está en el payload")
 
     # 2) Leer IDs existentes (solo esa columna → minimiza RAM)
-    if os.path.exists(parquet_path) and os.path.getsize(parquet_path) > 0:
-        ids_hist = pq.read_table(parquet_path, columns=[id_field])[id_field]
+    snapshot = snapshot_actual(parquet_path)
+    if snapshot is not None:
+        registrar_bytes(leidos=os.path.getsize(snapshot))
+        ids_hist = pq.read_table(snapshot, columns=[id_field])[id_field]
         existing_ids = set(ids_hist.to_pylist())          # Python set para lookup
-        tbl_hist = pq.read_table(parquet_path)            # se usará luego al concatenar
+        tbl_hist = pq.read_table(snapshot)                # se usará luego al concatenar
     else:
         existing_ids = set()
         tbl_hist = None
 
-    # 3) Filtrar solo los registros con ID nuevo
+    # 3) Filtrar solo los registros con ID nuevo (y sin repetidos dentro del lote:
+    #    ventanas contiguas o consultas repetidas pueden traer el mismo vuelo)
     # Cast to Arrow array to avoid "not a valid value set" errors
-    id_set = pa.array(sorted(existing_ids))
+    # (con el tipo de la columna: una partición nueva no tiene IDs previos)
+    id_set = pa.array(sorted(existing_ids), type=tbl_in[id_field].type)
     try:
         mask_new = pc.invert(pc.is_in(tbl_in[id_field], value_set=id_set))
     except Exception:
         mask_new = pc.invert(pc.is_in(tbl_in[id_field], value_set=list(existing_ids)))
     tbl_new = tbl_in.filter(mask_new)
+    _, primeros = np.unique(tbl_new[id_field].to_numpy(zero_copy_only=False), return_index=True)
+    if len(primeros) < tbl_new.num_rows:
+        tbl_new = tbl_new.take(pa.array(np.sort(primeros)))
 
-    # 4) Concatenar y persistir si hay novedades
+    # 4) Concatenar y publicar un snapshot nuevo si hay novedades
     if tbl_new.num_rows > 0:
-        tbl_out = pa.concat_tables([tbl_hist, tbl_new]) if tbl_hist else tbl_new
-        pq.write_table(tbl_out, parquet_path, compression=compression)
+        tbl_out = (
+            pa.concat_tables([tbl_hist, tbl_new], promote_options="default")
+            if tbl_hist else tbl_new
+        )
+        publicar_snapshot(
+            lambda destino: pq.write_table(
+                tbl_out, destino, compression=compression, row_group_size=row_group_size
+            ),
+            parquet_path,
+        )
 
     return tbl_new
 
-def save_flights_to_parquet(flights, output_path):
+def flatten_flights(flights, account: str | None = None) -> pd.DataFrame:
     """
-    Guarda los vuelos especificados en un archivo Parquet.
-    Extrae solo las columnas relevantes y crea un DataFrame.
+    Extrae solo las columnas relevantes de los vuelos y crea un DataFrame.
+    Cada fila lleva la cuenta de AirData de la que proviene en 'Account'.
     """
     rows = []
     for flight in flights:
@@ -183,29 +288,362 @@ def save_flights_to_parquet(flights, output_path):
                 "Total Mileage (Meters)": mileage,
                 "Latitude": latitude,
                 "Longitud": longitude,
+                "Account": account,
+                "Flight ID": None if flight.get("id") is None else str(flight["id"]),
             }
         )
-    df = pd.DataFrame(rows)
+    return pd.DataFrame(rows)
+
+
+def save_flights_to_parquet(flights, output_path, account: str | None = None):
+    """
+    Guarda los vuelos especificados en un archivo Parquet.
+    Extrae solo las columnas relevantes y crea un DataFrame.
+    """
+    df = flatten_flights(flights, account)
     # Exportamos a Parquet sin índice para que Power BI lo lea limpio
     df.to_parquet(output_path, index=False)
     return df
 
-def main(json_config, paquet_historico, parquet_api):
-    cfg   = load_json(json_config, {})
-    query = {
-        "start": get_last_flight_timestamp(paquet_historico),
-        "end": get_now_timestamp(),
-        "detail_level": "comprehensive",
+def load_accounts(cfg: dict) -> list[dict]:
+    """
+    Devuelve la lista de cuentas de AirData definidas en la configuración.
+
+    Acepta el formato con lista `accounts` (cada cuenta hereda las claves
+    globales como `base_url` o `page_size`) y el formato antiguo con un solo
+    `api_key`, que se trata como una cuenta llamada `default`.
+    """
+    if "accounts" not in cfg:
+        return [{**cfg, "name": cfg.get("name", "default")}] if cfg.get("api_key") else []
+    comunes = {k: v for k, v in cfg.items() if k != "accounts"}
+    return [{**comunes, **cuenta} for cuenta in cfg["accounts"]]
+
+
+def account_raw_path(paquet_historico, account: str) -> str:
+    """
+    Partición RAW de una cuenta: `<dir>/<historico>/account=<nombre>/<historico>.parquet`.
+    """
+    base, nombre = os.path.split(os.fspath(paquet_historico))
+    stem = os.path.splitext(nombre)[0]
+    return os.path.join(base, stem, f"account={account}", nombre)
+
+
+def cuenta_legado(cfg: dict) -> str | None:
+    """
+    Cuenta dueña del histórico del formato antiguo con la lista `accounts`:
+    `legacy_account` o la primera cuenta. None con el formato antiguo.
+    """
+    if "accounts" not in cfg:
+        return None
+    cuentas = load_accounts(cfg)
+    return cfg.get("legacy_account") or (cuentas[0]["name"] if cuentas else None)
+
+
+def migrar_historico_legado(paquet_historico, account: str) -> bool:
+    """
+    Pasa el histórico del formato antiguo (un solo `api_key`) a la partición
+    de `account` al cambiar a la lista `accounts`.
+
+    Sin esto la partición nueva no tendría marca de agua: se volvería a
+    descargar todo el histórico y cada vuelo quedaría duplicado. Si la
+    partición ya existe se le agregan solo los ids que no tenga. El histórico
+    antiguo se renombra a `*.migrado` para que nadie lo vuelva a leer.
+
+    Returns
+    -------
+    bool  (True si había un histórico antiguo que migrar)
+    """
+    legado = snapshot_actual(paquet_historico)
+    if legado is None:
+        return False
+    destino = account_raw_path(paquet_historico, account)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    tbl_legado = pq.read_table(legado)
+    snapshot = snapshot_actual(destino)
+    if snapshot is not None:
+        tbl_part = pq.read_table(snapshot)
+        ids_part = pc.cast(tbl_part["id"], tbl_legado["id"].type)
+        nuevos = pc.invert(pc.is_in(tbl_legado["id"], value_set=ids_part.combine_chunks()))
+        tbl_legado = pa.concat_tables(
+            [tbl_part, tbl_legado.filter(nuevos)], promote_options="default"
+        )
+    publicar_snapshot(
+        lambda d: pq.write_table(tbl_legado, d, compression="zstd", row_group_size=FILAS_POR_GRUPO),
+        destino,
+    )
+
+    ruta = os.fspath(paquet_historico)
+    sufijo = f".migrado-{datetime.now():%Y%m%dT%H%M%S}"
+    for viejo in (ruta, os.path.splitext(ruta)[0] + ".snapshots"):
+        if os.path.exists(viejo):
+            shutil.move(viejo, viejo + sufijo)
+    print(f"Histórico antiguo migrado a la cuenta '{account}': {destino}")
+    return True
+
+
+def union_ranges(rangos: list) -> tuple:
+    """Rango (start, end) que cubre todos los rangos; start None si alguno no tiene inicio."""
+    inicios = [r[0] for r in rangos]
+    return (
+        None if not rangos or None in inicios else min(inicios),
+        max((r[1] for r in rangos), default=None),
+    )
+
+
+def replay_flights(cfg: dict, cache: CachePaginas):
+    """
+    Repite desde la caché todas las consultas registradas de una cuenta,
+    sin acceder a la red. Devuelve (vuelos, stats) como `fetch_flights`.
+    """
+    vuelos, rangos = [], []
+    for query in cache.consultas(cfg.get("name", "default")):
+        data, st = fetch_flights(query, cfg, cache=cache)
+        vuelos.extend(data)
+        if st:
+            rangos.append(st["requested_range"])
+    stats = {
+        "requested_range": union_ranges(rangos),
+        "total": len(vuelos),
+        "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        "replay": True,
+    }
+    return vuelos, stats
+
+
+def fetch_windows(
+    cuenta: dict,
+    inicio: str | None,
+    fin: str,
+    limite: LimiteTasa | None = None,
+    cache: CachePaginas | None = None,
+):
+    """
+    Descarga el rango (inicio, fin) de una cuenta. Con caché se pide por
+    ventanas (`CachePaginas.ventanas`) para que los días cerrados se lean del
+    disco en ejecuciones repetidas. Si una ventana falla se devuelve solo lo
+    anterior a ella, así la marca de agua no salta el tramo que faltó.
+    """
+    rangos = cache.ventanas(inicio, fin) if cache is not None else [(inicio, fin)]
+    vuelos, stats = [], {}
+    for start, end in rangos:
+        query = {"start": start, "end": end, "detail_level": "comprehensive"}
+        data, st = fetch_flights(query, cuenta, limite, cache)
+        if not st:
+            break
+        vuelos.extend(data)
+        stats = {
+            "requested_range": (stats.get("requested_range", (start,))[0], end),
+            "total": len(vuelos),
+            "fetched_at": st.get("fetched_at"),
+            "pages": stats.get("pages", 0) + st.get("pages", 0),
+            "retries": stats.get("retries", 0) + st.get("retries", 0),
+        }
+    return vuelos, stats
+
+
+def fetch_account(
+    cuenta: dict,
+    raw_path: str,
+    telemetry_dir: str | None = None,
+    cache: CachePaginas | None = None,
+):
+    """
+    Descarga los vuelos nuevos de una cuenta desde su propia marca de agua
+    y los agrega a su partición RAW. Devuelve (tabla nueva, stats).
+
+    Si `telemetry_dir` está definido y la cuenta tiene `telemetry.enabled`,
+    descarga además la telemetría de los vuelos nuevos. Con una caché en modo
+    replay se repiten las consultas registradas y no se descarga telemetría.
+    """
+    limite = LimiteTasa(cuenta.get("rate_limit"))
+    if cache is not None and cache.replay:
+        api_resp, stats = replay_flights(cuenta, cache)
+        telemetry_dir = None
+    else:
+        api_resp, stats = fetch_windows(
+            cuenta, get_last_flight_timestamp(raw_path), get_now_timestamp(), limite, cache
+        )
+    if os.path.dirname(raw_path):
+        os.makedirs(os.path.dirname(raw_path), exist_ok=True)
+    tbl_new = save_raw_parquet_pa(api_resp, raw_path)
+    if telemetry_dir and cuenta.get("telemetry", {}).get("enabled"):
+        stats["telemetry"] = fetch_telemetry(
+            tbl_new, cuenta, os.fspath(telemetry_dir), cuenta["name"], limite
+        )
+    return tbl_new, stats
+
+
+def fetch_accounts(cfg: dict, paquet_historico, telemetry_dir=None, cache=None):
+    """
+    Descarga en paralelo los vuelos nuevos de todas las cuentas configuradas.
+
+    Returns
+    -------
+    nuevos : dict[str, pa.Table]
+        Filas RAW añadidas por cuenta.
+    stats : dict
+        Totales agregados y detalle por cuenta en `stats["accounts"]`.
+    """
+    cuentas = load_accounts(cfg)
+    # Con el formato antiguo se mantiene el histórico en su ruta original
+    particionado = "accounts" in cfg
+    if particionado and cuentas:
+        migrar_historico_legado(paquet_historico, cuenta_legado(cfg))
+
+    def _descargar(cuenta):
+        raw_path = (
+            account_raw_path(paquet_historico, cuenta["name"])
+            if particionado else paquet_historico
+        )
+        return fetch_account(cuenta, raw_path, telemetry_dir, cache)
+
+    workers = cfg.get("max_workers") or len(cuentas) or 1
+    with EjecutorHilos(max_workers=workers) as pool:
+        resultados = list(pool.map(_descargar, cuentas))
+
+    nuevos, por_cuenta = {}, {}
+    for cuenta, (tbl_new, st) in zip(cuentas, resultados):
+        nuevos[cuenta["name"]] = tbl_new
+        por_cuenta[cuenta["name"]] = st
+
+    rangos = [st["requested_range"] for st in por_cuenta.values() if "requested_range" in st]
+    stats = {
+        "requested_range": union_ranges(rangos),
+        "total": sum(st.get("total", 0) for st in por_cuenta.values()),
+        "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        "accounts": por_cuenta,
     }
-    api_resp, stats = fetch_flights(query, cfg)
-    print (api_resp)
-    print (stats)
-    nuevos = save_raw_parquet_pa(api_resp, paquet_historico)
-    df_saved = save_flights_to_parquet(
-        nuevos.to_pandas().to_dict("records"), parquet_api
+    return nuevos, stats
+
+
+# Texto que se acepta como número (tras cambiar ',' por '.'), como `definir_tipos`
+NUMERO_RE = r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$"
+
+# Esquema del batch aplanado (mismas columnas que `flatten_flights`)
+FLAT_SCHEMA = pa.schema([
+    ("Flight/Service Date", pa.string()),
+    ("Pilot-in-Command", pa.string()),
+    ("Air Seconds", pa.float64()),
+    ("Air+Ground Seconds", pa.float64()),
+    ("Drone Name", pa.string()),
+    ("Takeoff Bat %", pa.float64()),
+    ("Landing Bat %", pa.float64()),
+    ("Max Altitude (Meters)", pa.float64()),
+    ("Max Distance (Meters)", pa.float64()),
+    ("Total Mileage (Meters)", pa.float64()),
+    ("Latitude", pa.float64()),
+    ("Longitud", pa.float64()),
+    ("Account", pa.string()),
+    ("Flight ID", pa.string()),
+])
+
+
+def _field(tbl: pa.Table, *ruta: str, tipo: pa.DataType = pa.string()):
+    """
+    Columna anidada `ruta` del payload RAW convertida a `tipo`.
+    Devuelve nulos si algún nivel no existe en el esquema.
+    """
+    if ruta[0] not in tbl.column_names:
+        return pa.nulls(tbl.num_rows, tipo)
+    arr = tbl[ruta[0]]
+    for nombre in ruta[1:]:
+        if not pa.types.is_struct(arr.type) or arr.type.get_field_index(nombre) < 0:
+            return pa.nulls(tbl.num_rows, tipo)
+        arr = pc.struct_field(arr, nombre)
+    if pa.types.is_string(arr.type) and not pa.types.is_string(tipo):
+        # '-23,5' ➜ '-23.5'; lo que no sea número ('', 'abc') ➜ nulo, para que
+        # la fila llegue a la validación (y a cuarentena) en vez de abortar el cast
+        arr = pc.replace_substring(pc.utf8_trim_whitespace(arr), ",", ".")
+        es_numero = pc.fill_null(pc.match_substring_regex(arr, NUMERO_RE), False)
+        arr = pc.if_else(es_numero, arr, pa.scalar(None, arr.type))
+    return pc.cast(arr, tipo)
+
+
+def _pilot_in_command(tbl: pa.Table) -> pa.Array:
+    """Nombre del primer participante con rol 'Pilot-in-Command' ('' si no hay)."""
+    vacio = pa.array([""] * tbl.num_rows, pa.string())
+    if "participants" not in tbl.column_names:
+        return vacio
+    tipo = tbl["participants"].type
+    if not pa.types.is_struct(tipo) or tipo.get_field_index("data") < 0:
+        return vacio
+    listas = pc.struct_field(tbl["participants"], "data").combine_chunks()
+    # Sin participantes en todo el lote Arrow infiere `list<null>`
+    if (
+        not pa.types.is_list(listas.type)
+        or not pa.types.is_struct(listas.type.value_type)
+        or listas.type.value_type.get_field_index("role") < 0
+        or listas.type.value_type.get_field_index("name") < 0
+    ):
+        return vacio
+
+    personas = pc.list_flatten(listas)
+    padres = pc.list_parent_indices(listas).to_numpy()
+    es_piloto = pc.fill_null(pc.equal(pc.struct_field(personas, "role"), "Pilot-in-Command"), False)
+    pos = np.flatnonzero(es_piloto.to_numpy(zero_copy_only=False))
+    # primera coincidencia de cada vuelo
+    vuelos, primero = np.unique(padres[pos], return_index=True)
+    indices = np.full(tbl.num_rows, -1)
+    indices[vuelos] = pos[primero]
+    nombres = pc.take(
+        pc.struct_field(personas, "name"),
+        pa.array(indices, mask=indices < 0),
     )
-    return nuevos, df_saved, stats
-json_config       = r"C:\Users\benpi\OneDrive\Escritorio\AutoRommexDjango\rommex\data\config.json"
-paquet_historico  = r"C:\Users\benpi\OneDrive\Escritorio\AutoRommexDjango\rommex\data\historico.parquet"
-parquet_api       = r"C:\Users\benpi\OneDrive\Escritorio\AutoRommexDjango\rommex\data\flights_api.parquet"
-main(json_config, paquet_historico, parquet_api)
\ No newline at end of file
+    return pc.fill_null(pc.cast(nombres, pa.string()), "")
+
+
+def flatten_table(tbl: pa.Table, account: str | None = None) -> pa.Table:
+    """
+    Versión columnar de `flatten_flights`: extrae las columnas relevantes del
+    payload RAW directamente sobre Arrow, sin pasar por listas de dicts.
+    """
+    n = tbl.num_rows
+    columnas = [
+        pc.coalesce(_field(tbl, "timeISO"), _field(tbl, "time")),
+        _pilot_in_command(tbl),
+        _field(tbl, "duration", "airDuration", tipo=pa.float64()),
+        _field(tbl, "duration", "logDuration", tipo=pa.float64()),
+        _field(tbl, "drone", "name"),
+        _field(tbl, "batteryPercent", "takeOff", tipo=pa.float64()),
+        _field(tbl, "batteryPercent", "landing", tipo=pa.float64()),
+        _field(tbl, "altitude", "max", tipo=pa.float64()),
+        _field(tbl, "distance", "max", tipo=pa.float64()),
+        _field(tbl, "mileage", "total", tipo=pa.float64()),
+        _field(tbl, "takeOffLatitude", tipo=pa.float64()),
+        _field(tbl, "takeOffLongitude", tipo=pa.float64()),
+        pa.array([account] * n, pa.string()),
+        _field(tbl, "id"),
+    ]
+    return pa.Table.from_arrays(columnas, schema=FLAT_SCHEMA)
+
+
+def main(json_config, paquet_historico, parquet_api=None, telemetry_dir=None):
+    """
+    Descarga los vuelos nuevos de todas las cuentas y devuelve el batch aplanado.
+
+    Returns
+    -------
+    nuevos : dict[str, pa.Table]
+        Filas RAW añadidas por cuenta.
+    df_saved : pd.DataFrame
+        Batch unificado (con columna 'Account'); si se indica `parquet_api`
+        también se escribe ahí.
+    stats : dict
+        Totales agregados y detalle por cuenta en `stats["accounts"]`.
+    """
+    cfg = load_json(json_config, {})
+    nuevos, stats = fetch_accounts(cfg, paquet_historico, telemetry_dir)
+    tbl = pa.concat_tables(
+        [flatten_table(t, name) for name, t in nuevos.items()]
+    ) if nuevos else FLAT_SCHEMA.empty_table()
+    if parquet_api is not None:
+        # Exportamos a Parquet sin índice para que Power BI lo lea limpio
+        pq.write_table(tbl, parquet_api)
+    return nuevos, tbl.to_pandas(), stats
+
+
+if __name__ == "__main__":
+    json_config       = r"C:\Users\benpi\OneDrive\Escritorio\AutoRommexDjango\rommex\data\config.json"
+    paquet_historico  = r"C:\Users\benpi\OneDrive\Escritorio\AutoRommexDjango\rommex\data\historico.parquet"
+    parquet_api       = r"C:\Users\benpi\OneDrive\Escritorio\AutoRommexDjango\rommex\data\flights_api.parquet"
+    main(json_config, paquet_historico, parquet_api)
@@ -0,0 +1,188 @@
+# El objetivo principal de este script es perfilar una ejecución del ETL bajo
+# demanda: cada etapa corre bajo cProfile (también en los hilos de sus
+# `EjecutorHilos`) y tracemalloc, y el resultado queda en una carpeta con fecha
+# que contiene un .pstats por etapa, un resumen de asignaciones y un archivo de
+# pilas colapsadas compatible con flamegraph.pl / speedscope. Sin perfil no se
+# instala nada.
+import cProfile
+import functools
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from .Metricas import envoltura_tareas
+
+TOP_ASIGNACIONES = 25
+PROFUNDIDAD_MAXIMA = 64
+
+# tracemalloc es global al proceso: solo una ejecución perfilada a la vez
+_EN_CURSO = threading.Lock()
+
+# Desde Python 3.12 cProfile usa `sys.monitoring`: un perfilador activo registra
+# todos los hilos del proceso y no se puede separar por hilo
+PERFIL_POR_PROCESO = sys.version_info >= (3, 12)
+
+
+class PerfilEjecucion:
+    """
+    Perfil de una ejecución del ETL. Se usa como contexto alrededor de toda
+    la ejecución (`with perfil:`); otra ejecución perfilada espera a que
+    termine la anterior, porque tracemalloc es uno solo para el proceso.
+    Solo se perfilan el hilo que ejecuta la etapa y las tareas enviadas a un
+    `EjecutorHilos` desde ella; los demás hilos del servidor no se tocan.
+
+    En Python 3.12+ el perfilador ve todos los hilos del proceso, así que se
+    rechaza (RuntimeError) si al crearlo hay otros hilos vivos, p. ej. bajo un
+    servidor con varios hilos; ahí se usa `python main.py --profile`.
+
+    Parameters
+    ----------
+    directorio : str | Path
+        Carpeta base; el reporte se escribe en `<directorio>/<fecha>-<id>/`.
+    top : int
+        Cantidad de líneas con más memoria asignada que se listan por etapa.
+    """
+
+    def __init__(self, directorio, top: int = TOP_ASIGNACIONES):
+        if PERFIL_POR_PROCESO and threading.active_count() > 1:
+            raise RuntimeError(
+                "En Python 3.12+ cProfile registra todos los hilos del proceso; "
+                "perfile con `python main.py --profile`"
+            )
+        self.carpeta = os.path.join(
+            os.fspath(directorio),
+            f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}",
+        )
+        self.top = top
+        self._orden = 0
+        self._activo = False
+        os.makedirs(self.carpeta)
+
+    def __enter__(self):
+        _EN_CURSO.acquire()
+        self._activo = True
+        return self
+
+    def __exit__(self, *exc):
+        self._activo = False
+        _EN_CURSO.release()
+        return False
+
+    @contextmanager
+    def etapa(self, nombre: str):
+        """Perfila el bloque y agrega sus resultados al reporte."""
+        if not self._activo:
+            raise RuntimeError("PerfilEjecucion.etapa se usa dentro de `with perfil:`")
+        self._orden += 1
+        hilos, hilos_lock = [], threading.Lock()
+
+        def envolver(fn):
+            # Cada tarea del pool corre con su propio perfilador en su hilo
+            @functools.wraps(fn)
+            def tarea(*args, **kwargs):
+                perfil = cProfile.Profile()
+                try:
+                    perfil.enable()
+                except ValueError:
+                    # Python 3.12+: `principal` ya registra este hilo (ver PERFIL_POR_PROCESO)
+                    return fn(*args, **kwargs)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    perfil.disable()
+                    with hilos_lock:
+                        hilos.append(perfil)
+            return tarea
+
+        iniciar_tracemalloc = not tracemalloc.is_tracing()
+        if iniciar_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        principal = cProfile.Profile()
+        token = envoltura_tareas.set(envolver)
+        principal.enable()
+        try:
+            yield
+        finally:
+            principal.disable()
+            envoltura_tareas.reset(token)
+            asignaciones = tracemalloc.take_snapshot()
+            _, pico = tracemalloc.get_traced_memory()
+            if iniciar_tracemalloc:
+                tracemalloc.stop()
+
+            stats = pstats.Stats(principal)
+            for perfil in hilos:
+                stats.add(perfil)
+            base = f"{self._orden:02d}-{nombre}"
+            stats.dump_stats(os.path.join(self.carpeta, f"{base}.pstats"))
+            self._escribir_asignaciones(nombre, asignaciones, pico)
+            self._escribir_pilas(nombre, stats)
+
+    def _escribir_asignaciones(self, nombre: str, snapshot, pico: int):
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        lineas = [f"== {nombre} | pico {pico / 1024 / 1024:.1f} MiB"]
+        for stat in snapshot.statistics("lineno")[: self.top]:
+            frame = stat.traceback[0]
+            lineas.append(
+                f"{stat.size / 1024:10.1f} KiB {stat.count:8d} bloques  "
+                f"{frame.filename}:{frame.lineno}"
+            )
+        with open(os.path.join(self.carpeta, "allocations.txt"), "a", encoding="utf-8") as f:
+            f.write("\n".join(lineas) + "\n\n")
+
+    def _escribir_pilas(self, nombre: str, stats: pstats.Stats):
+        with open(os.path.join(self.carpeta, "stacks.collapsed"), "a", encoding="utf-8") as f:
+            for pila, microsegundos in pilas_colapsadas(stats, raiz=nombre).items():
+                f.write(f"{pila} {microsegundos}\n")
+
+
+def _marco(funcion) -> str:
+    archivo, linea, nombre = funcion
+    if archivo == "~":                       # funciones built-in
+        return nombre.replace(";", ",")
+    return f"{nombre} ({os.path.basename(archivo)}:{linea})".replace(";", ",")
+
+
+def pilas_colapsadas(stats: pstats.Stats, raiz: str | None = None) -> dict[str, int]:
+    """
+    Reconstruye pilas colapsadas (`a;b;c microsegundos`) desde el grafo de
+    llamadas de pstats. El tiempo acumulado de cada función se reparte entre
+    sus llamadores en proporción al tiempo que aportó cada uno; los ciclos
+    (recursión) se cortan al repetir una función en la misma pila.
+    """
+    hijos: dict = {}
+    for funcion, (_, _, _, _, llamadores) in stats.stats.items():
+        for llamador, (_, _, _, acumulado) in llamadores.items():
+            hijos.setdefault(llamador, []).append((funcion, acumulado))
+
+    pilas: dict[str, int] = {}
+
+    def recorrer(funcion, presupuesto, pila, en_pila):
+        _, _, propio, acumulado, _ = stats.stats[funcion]
+        escala = presupuesto / acumulado if acumulado else 0.0
+        marcos = pila + [_marco(funcion)]
+        tiempo = int(propio * escala * 1e6)
+        if tiempo:
+            clave = ";".join(marcos)
+            pilas[clave] = pilas.get(clave, 0) + tiempo
+        if len(marcos) >= PROFUNDIDAD_MAXIMA:
+            return
+        for hijo, acumulado_arista in hijos.get(funcion, ()):
+            sub = acumulado_arista * escala
+            if hijo not in en_pila and sub >= 1e-6:
+                recorrer(hijo, sub, marcos, en_pila | {hijo})
+
+    inicio = [raiz] if raiz else []
+    for funcion, (_, _, _, acumulado, llamadores) in stats.stats.items():
+        if not llamadores:
+            recorrer(funcion, acumulado, inicio, {funcion})
+    return pilas
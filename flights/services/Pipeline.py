@@ -0,0 +1,171 @@
+# El objetivo principal de este script es encadenar las etapas del ETL sobre
+# un único `pa.Table` en memoria: descarga ➜ aplanado ➜ validación ➜ región ➜
+# procesamiento. Las etapas se pasan la tabla (o vistas filtradas de ella) sin
+# escribir ni releer `flights_api.parquet`, que queda como checkpoint opcional.
+import json
+import logging
+import time
+from contextlib import nullcontext
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .ObtenerVuelos import FLAT_SCHEMA, fetch_accounts, flatten_table, load_json
+from .Validar import validar_tabla, guardar_cuarentena
+from .Clean import clasificar_region_tabla
+from .Procesar import procesar_tabla
+from .Grilla import actualizar_grilla
+from .Cache import cache_desde_config
+from .Snapshots import bloqueo_exclusivo
+from .Metricas import REGISTRO, medir_etapa, memoria_pico
+
+logger = logging.getLogger("flights.etl")
+
+
+class PipelineVuelos:
+    """
+    Ejecuta el ETL completo manteniendo el batch como Arrow entre etapas.
+
+    Parameters
+    ----------
+    json_config, paquet_historico, final_parquet, quarantine_dir, grid_parquet
+        Rutas de configuración, RAW, salida final, cuarentena y grilla.
+    telemetry_dir : str | None
+        Raíz del dataset de trayectorias (solo si la cuenta lo habilita).
+    checkpoint : str | None
+        Si se indica, el batch aplanado también se escribe ahí (depuración).
+    cache_dir : str | None
+        Carpeta de la caché de páginas de la API (None la desactiva).
+    replay : bool
+        Ejecuta todo el ETL desde las páginas en caché, sin red.
+    perfil : PerfilEjecucion | None
+        Si se indica, cada etapa corre bajo cProfile y tracemalloc (las
+        ejecuciones perfiladas del proceso se hacen de a una).
+    """
+
+    def __init__(
+        self,
+        json_config,
+        paquet_historico,
+        final_parquet,
+        quarantine_dir,
+        grid_parquet,
+        telemetry_dir=None,
+        checkpoint=None,
+        cache_dir=None,
+        replay=False,
+        perfil=None,
+    ):
+        if replay and cache_dir is None:
+            raise ValueError("El modo replay necesita una carpeta de caché")
+        self.json_config = json_config
+        self.paquet_historico = paquet_historico
+        self.final_parquet = final_parquet
+        self.quarantine_dir = quarantine_dir
+        self.grid_parquet = grid_parquet
+        self.telemetry_dir = telemetry_dir
+        self.checkpoint = checkpoint
+        self.cache_dir = cache_dir
+        self.replay = replay
+        self.perfil = perfil
+
+        self.nuevos: dict[str, pa.Table] = {}
+        self.stats: dict = {}
+        self.tabla: pa.Table = FLAT_SCHEMA.empty_table()
+        self.resultado: dict = {}
+
+    # --- Etapas ---
+
+    def obtener(self):
+        cfg = load_json(self.json_config, {})
+        cache = cache_desde_config(cfg, self.cache_dir, self.replay)
+        self.nuevos, self.stats = fetch_accounts(
+            cfg, self.paquet_historico, self.telemetry_dir, cache
+        )
+        self.resultado["fetched"] = sum(t.num_rows for t in self.nuevos.values())
+        self.resultado["accounts"] = {n: t.num_rows for n, t in self.nuevos.items()}
+        return self.resultado["fetched"]
+
+    def aplanar(self):
+        if self.nuevos:
+            self.tabla = pa.concat_tables(
+                [flatten_table(t, name) for name, t in self.nuevos.items()]
+            )
+        if self.checkpoint is not None:
+            pq.write_table(self.tabla, self.checkpoint)
+        return self.tabla.num_rows
+
+    def validar(self):
+        self.tabla, cuarentena, conteos = validar_tabla(
+            self.tabla, self.stats.get("requested_range")
+        )
+        guardar_cuarentena(cuarentena, self.quarantine_dir)
+        self.resultado["quarantined"] = len(cuarentena)
+        self.resultado["validation"] = conteos
+        return self.tabla.num_rows
+
+    def clasificar_region(self):
+        kept, discarded = clasificar_region_tabla(self.tabla)
+        self.resultado["kept"] = kept.num_rows
+        self.resultado["discarded"] = discarded.num_rows
+        return self.tabla.num_rows
+
+    def procesar(self):
+        procesado = procesar_tabla(self.tabla, self.final_parquet)
+        # Grilla de zonas de operación (incremental, solo con el batch nuevo)
+        actualizar_grilla(procesado, self.grid_parquet)
+        return len(procesado)
+
+    def etapas(self):
+        """Etapas en orden de ejecución como (nombre, callable que devuelve filas de salida)."""
+        return [
+            ("obtener", self.obtener),
+            ("aplanar", self.aplanar),
+            ("validar", self.validar),
+            ("clasificar_region", self.clasificar_region),
+            ("procesar", self.procesar),
+        ]
+
+    def ejecutar(self) -> dict:
+        """
+        Ejecuta las etapas midiendo duración, filas, bytes y memoria de cada
+        una. Al terminar deja una línea JSON en el logger `flights.etl`.
+        Toma el bloqueo de `final_parquet`: un reproceso en curso termina antes.
+        """
+        inicio = time.perf_counter()
+        medidas, filas, estado = [], 0, "error"
+        try:
+            with bloqueo_exclusivo(self.final_parquet), self.perfil or nullcontext():
+                for nombre, etapa in self.etapas():
+                    perfilar = self.perfil.etapa(nombre) if self.perfil else nullcontext()
+                    with medir_etapa(nombre) as m, perfilar:
+                        medidas.append(m)
+                        m["rows_in"] = filas
+                        filas = m["rows_out"] = etapa()
+            estado = "ok"
+        finally:
+            REGISTRO.incrementar("rommex_etl_runs_total", status=estado)
+            REGISTRO.fijar("rommex_etl_last_run_timestamp_seconds", time.time())
+            logger.info(json.dumps({
+                "event": "etl_run",
+                "status": estado,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                "duration_seconds": round(time.perf_counter() - inicio, 6),
+                "process_peak_memory_bytes": memoria_pico(),
+                "replay": self.replay,
+                "stages": medidas,
+                "http": {
+                    cuenta: {k: st.get(k, 0) for k in ("pages", "retries")}
+                    for cuenta, st in self.stats.get("accounts", {}).items()
+                },
+                "result": {k: v for k, v in self.resultado.items()},
+            }, default=str))
+        print(
+            f"Nuevos vuelos: {self.resultado['fetched']} | "
+            f"En Antofagasta: {self.resultado['kept']} | "
+            f"Descartados fuera de la región: {self.resultado['discarded']}"
+        )
+        self.resultado["api_total"] = self.stats.get("total")
+        self.resultado["range"] = self.stats.get("requested_range")
+        if self.perfil is not None:
+            self.resultado["profile"] = self.perfil.carpeta
+        return self.resultado
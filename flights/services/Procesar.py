@@ -1,99 +1,15 @@
 # El objetivo principal es crear columnas calculadas a partir de un CSV de vuelos
 # y guardar el resultado en un nuevo archivo CSV o Parquet.
+import numpy as np
 import pandas as pd
 import os
+from .Snapshots import publicar_snapshot, snapshot_actual
+from .Metricas import registrar_bytes
 # Listas de pilotos por equipo
 pilotos_turno_a = ["Marcelo Crosgrover", "Fernando Vargas"]
 pilotos_turno_b = ["Luciano Erazo", "Carlos Farias"]
 
 
-def calcular_turno(fecha_str):
-    """
-    Determina si un vuelo fue de día o de noche.
-    Día: de 08:00 a 20:00 (inclusive de 08:00, exclusivo de 20:00).
-    Noche: caso contrario.
-    """
-    dt = pd.to_datetime(fecha_str)
-    hora = dt.hour
-    return "Dia" if 8 <= hora < 20 else "Noche"
-
-
-def calcular_uso_bat(takeoff_pct, landing_pct):
-    """
-    Calcula el uso porcentual de batería.
-    Uso % Bat = Takeoff Bat % - Landing Bat %
-    """
-    try:
-        return float(takeoff_pct) - float(landing_pct)
-    except (ValueError, TypeError) as e:
-        print(
-            f"[ERROR] Uso % Bat: takeoff='{takeoff_pct}' ({type(takeoff_pct)}), "
-            f"landing='{landing_pct}' ({type(landing_pct)}) — {e}"
-        )
-    return None
-
-
-def calcular_ground_seconds(air_and_ground, air_secs):
-    """
-    Calcula los segundos en tierra y redondea a 2 decimales.
-    Ground Seconds = Air+Ground Seconds - Air Seconds
-    """
-    try:
-        val = float(air_and_ground) - float(air_secs)
-        return round(val, 2)
-    except (ValueError, TypeError):
-        return None
-
-
-def calcular_air_minutes(air_secs):
-    """
-    Calcula el tiempo de aire en minutos y redondea a 2 decimales.
-    Air Minutes = Air Seconds / 60
-    """
-    try:
-        val = float(air_secs) / 60
-        return round(val, 2)
-    except (ValueError, TypeError):
-        return None
-
-
-def calcular_air_hours(air_secs):
-    """
-    Calcula el tiempo de aire en horas y redondea a 2 decimales.
-    Air Hours = Air Seconds / 3600
-    """
-    try:
-        val = float(air_secs) / 3600
-        return round(val, 2)
-    except (ValueError, TypeError):
-        return None
-
-
-def calcular_km_recorridos(total_mileage_m):
-    """
-    Calcula los kilómetros recorridos y redondea a 2 decimales.
-    Km Recorridos = Total Mileage (Meters) / 1000
-    """
-    try:
-        val = float(total_mileage_m) / 1000
-        return round(val, 2)
-    except (ValueError, TypeError):
-        return None
-
-
-def determinar_equipo_piloto(pilot_name):
-    """
-    Asigna el equipo del piloto según listas predefinidas.
-    Retorna "Pilotos Turno A", "Pilotos Turno B" o "Otro".
-    """
-    if pilot_name in pilotos_turno_a:
-        return "Pilotos Turno A"
-    elif pilot_name in pilotos_turno_b:
-        return "Pilotos Turno B"
-    else:
-        return "Otro"
-
-
 def formatear_decimal(x, precision=6):
     """
     Convierte un valor numérico o cadena a string con separador decimal punto
@@ -129,7 +45,7 @@ def definir_tipos(df: pd.DataFrame) -> pd.DataFrame:
         "Latitude",
     ]
     for col in float_cols:
-        if col in df.columns:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
             df[col] = pd.to_numeric(
                 df[col].astype(str).str.replace(",", ".", regex=False), errors="coerce"
             )
@@ -147,49 +63,113 @@ def definir_tipos(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def procesar_datos(input_parquet: str, output_parquet: str):
+def calcular_columnas(df_nuevo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipifica el batch nuevo y agrega las columnas calculadas. Es la única
+    definición de las reglas de derivación (la usan el ETL y el reproceso):
+    • Turno          ➜ "Dia" de 08:00 a 20:00 (sin incluir 20:00), si no "Noche".
+    • Uso % Bat      ➜ Takeoff Bat % - Landing Bat %.
+    • Ground Seconds ➜ Air+Ground Seconds - Air Seconds.
+    • Air Minutes / Air Hours / Km Recorridos ➜ conversiones de unidades.
+    • Equipo Piloto  ➜ según `pilotos_turno_a` / `pilotos_turno_b`, si no "Otro".
+    Se calculan por columna completa con 2 decimales; los valores inválidos
+    quedan NaN (la validación previa ya envió esas filas a cuarentena).
+    """
+    df_nuevo = definir_tipos(df_nuevo)
+    hora = df_nuevo["Flight/Service Date"].dt.hour
+    df_nuevo["Turno"] = np.where((hora >= 8) & (hora < 20), "Dia", "Noche")
+    df_nuevo["Uso % Bat"] = df_nuevo["Takeoff Bat %"] - df_nuevo["Landing Bat %"]
+    df_nuevo["Ground Seconds"] = (
+        df_nuevo["Air+Ground Seconds"] - df_nuevo["Air Seconds"]
+    ).round(2)
+    df_nuevo["Air Minutes"] = (df_nuevo["Air Seconds"] / 60).round(2)
+    df_nuevo["Air Hours"] = (df_nuevo["Air Seconds"] / 3600).round(2)
+    df_nuevo["Km Recorridos"] = (df_nuevo["Total Mileage (Meters)"] / 1000).round(2)
+    pilotos = df_nuevo["Pilot-in-Command"]
+    df_nuevo["Equipo Piloto"] = np.select(
+        [pilotos.isin(pilotos_turno_a), pilotos.isin(pilotos_turno_b)],
+        ["Pilotos Turno A", "Pilotos Turno B"],
+        default="Otro",
+    )
+    return df_nuevo
+
+
+def descartar_existentes(df_nuevo: pd.DataFrame, df_existente: pd.DataFrame) -> pd.DataFrame:
+    """
+    Quita del batch los vuelos que ya están en el histórico procesado.
+    Se compara por 'Flight ID'; las filas antiguas sin id (anteriores a esa
+    columna) se comparan por fecha y dron.
+    """
+    if df_nuevo.empty or df_existente.empty:
+        return df_nuevo
+    repetido = pd.Series(False, index=df_nuevo.index)
+    ids = df_existente["Flight ID"] if "Flight ID" in df_existente else pd.Series(dtype="string")
+    if "Flight ID" in df_nuevo:
+        repetido |= df_nuevo["Flight ID"].notna() & df_nuevo["Flight ID"].isin(ids.dropna())
+        repetido |= df_nuevo["Flight ID"].notna() & df_nuevo["Flight ID"].duplicated()
+    clave = ["Flight/Service Date", "Drone Name"]
+    sin_id = df_existente[ids.isna().to_numpy()] if len(ids) else df_existente
+    if not sin_id.empty and all(c in df_nuevo and c in sin_id for c in clave):
+        repetido |= pd.MultiIndex.from_frame(df_nuevo[clave]).isin(
+            pd.MultiIndex.from_frame(sin_id[clave])
+        )
+    return df_nuevo[~repetido]
+
+
+def anexar_final(df_nuevo: pd.DataFrame, output_parquet: str) -> pd.DataFrame:
     """
-    Lee el histórico (output_parquet), lee el batch nuevo (input_parquet),
-    aplica esquema y cálculos sólo al batch nuevo, concatena sin duplicados
-    y reescribe el histórico completo.
+    Une el histórico procesado (output_parquet) con el batch ya calculado,
+    sin repetir vuelos que ya estén, reindexa y publica un snapshot nuevo del
+    Parquet de salida. Devuelve las filas del batch realmente agregadas.
     """
     # 1) Cargo el histórico completo, si existe y no está vacío
-    if os.path.exists(output_parquet) and os.path.getsize(output_parquet) > 0:
-        df_existente = pd.read_parquet(output_parquet, engine="pyarrow")
+    snapshot = snapshot_actual(output_parquet)
+    if snapshot is not None:
+        if df_nuevo.empty:
+            return df_nuevo               # nada nuevo: el snapshot vigente sirve
+        registrar_bytes(leidos=os.path.getsize(snapshot))
+        df_existente = pd.read_parquet(snapshot, engine="pyarrow")
+        df_nuevo = descartar_existentes(df_nuevo, df_existente)
+        if df_nuevo.empty:
+            return df_nuevo
     else:
         df_existente = pd.DataFrame()
-    # 2) Cargo y tipifico el batch nuevo
+
+    # 2) Uno histórico + nuevo
+    df = pd.concat([df_existente, df_nuevo], ignore_index=True) if not df_nuevo.empty else df_existente
+
+    # 3) Reindexo y publico un snapshot nuevo del Parquet de salida
+    df = df.reset_index(drop=True)
+    df.index.name = "ID"
+    publicar_snapshot(
+        lambda destino: df.to_parquet(destino, engine="pyarrow", index=True),
+        output_parquet,
+    )
+    return df_nuevo
+
+
+def procesar_tabla(tbl, output_parquet: str) -> pd.DataFrame:
+    """
+    Procesa un batch aplanado que llega en memoria como `pa.Table` y lo anexa
+    al histórico. Devuelve el batch nuevo ya procesado.
+    """
+    df_nuevo = tbl.to_pandas() if tbl.num_rows else pd.DataFrame()
+    if not df_nuevo.empty:
+        df_nuevo = calcular_columnas(df_nuevo)
+    return anexar_final(df_nuevo, output_parquet)
+
+
+def procesar_datos(input_parquet: str, output_parquet: str):
+    """
+    Lee el histórico (output_parquet), lee el batch nuevo (input_parquet),
+    aplica esquema y cálculos sólo al batch nuevo, concatena sin duplicados
+    y reescribe el histórico completo. Devuelve el batch nuevo ya procesado.
+    """
     if os.path.exists(input_parquet) and os.path.getsize(input_parquet) > 0:
         df_nuevo = pd.read_parquet(input_parquet, engine="pyarrow")
     else:
         df_nuevo = pd.DataFrame()
 
     if not df_nuevo.empty:
-        df_nuevo = definir_tipos(df_nuevo)
-    # 3) Agrego columnas calculadas **sobre df_nuevo**
-        df_nuevo["Turno"] = df_nuevo["Flight/Service Date"].apply(calcular_turno)
-        df_nuevo["Uso % Bat"] = df_nuevo.apply(
-            lambda x: calcular_uso_bat(x["Takeoff Bat %"], x["Landing Bat %"]), axis=1
-        )
-        df_nuevo["Ground Seconds"] = df_nuevo.apply(
-            lambda x: calcular_ground_seconds(x["Air+Ground Seconds"], x["Air Seconds"]),
-            axis=1,
-        )
-        df_nuevo["Air Minutes"] = df_nuevo["Air Seconds"].apply(calcular_air_minutes)
-        df_nuevo["Air Hours"] = df_nuevo["Air Seconds"].apply(calcular_air_hours)
-        df_nuevo["Km Recorridos"] = df_nuevo["Total Mileage (Meters)"].apply(
-            calcular_km_recorridos
-        )
-        df_nuevo["Equipo Piloto"] = df_nuevo["Pilot-in-Command"].apply(
-            determinar_equipo_piloto
-        )
-
-        # 4) Uno histórico + nuevo
-        df = pd.concat([df_existente, df_nuevo], ignore_index=True)
-    else:
-        df = df_existente
-
-    # 5) Reindexo y sobrescribo el Parquet de salida
-    df = df.reset_index(drop=True)
-    df.index.name = "ID"
-    df.to_parquet(output_parquet, engine="pyarrow", index=True)
+        df_nuevo = calcular_columnas(df_nuevo)
+    return anexar_final(df_nuevo, output_parquet)
@@ -0,0 +1,243 @@
+# El objetivo principal de este script es reconstruir FlightsFinal desde el
+# histórico RAW completo cuando cambian las reglas de derivación (turnos,
+# equipos, región, conversiones). El RAW se reparte por row groups entre
+# procesos; cada proceso escribe su propio fragmento y el proceso principal
+# los copia en orden, de a uno, al snapshot nuevo (sin juntar todo en memoria).
+import glob
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .ObtenerVuelos import FILAS_POR_GRUPO, flatten_table, migrar_historico_legado
+from .Validar import validar_tabla
+from .Clean import clasificar_region_tabla
+from .Procesar import calcular_columnas
+from .Snapshots import bloqueo_exclusivo, publicar_snapshot, snapshot_actual, snapshot_dir
+from .Grilla import agregar_grilla, combinar_grilla, publicar_grilla
+
+
+def raw_sources(paquet_historico, default_account: str = "default") -> list[tuple[str, str]]:
+    """
+    Históricos RAW con datos como lista de (cuenta, ruta lógica).
+    Incluye el histórico del formato antiguo y las particiones `account=*`.
+    """
+    fuentes = []
+    if snapshot_actual(paquet_historico) is not None:
+        fuentes.append((default_account, os.fspath(paquet_historico)))
+
+    base, nombre = os.path.split(os.fspath(paquet_historico))
+    stem = os.path.splitext(nombre)[0]
+    for carpeta in sorted(glob.glob(os.path.join(base, stem, "account=*"))):
+        ruta = os.path.join(carpeta, nombre)
+        if snapshot_actual(ruta) is not None:
+            fuentes.append((os.path.basename(carpeta).split("=", 1)[1], ruta))
+    return fuentes
+
+
+def reagrupar_raw(ruta, filas_por_grupo: int = FILAS_POR_GRUPO) -> str:
+    """
+    Snapshot vigente de `ruta` con row groups de a lo más `filas_por_grupo`.
+
+    Los históricos escritos antes de fijar `row_group_size` tienen un único
+    row group y se reprocesarían en una sola tarea: se reescriben una vez, por
+    lotes (sin cargar el archivo completo), y se publican como snapshot nuevo.
+    """
+    snapshot = snapshot_actual(ruta)
+    archivo = pq.ParquetFile(snapshot)
+    meta = archivo.metadata
+    if all(meta.row_group(i).num_rows <= filas_por_grupo for i in range(meta.num_row_groups)):
+        return snapshot
+
+    def escribir(destino):
+        with pq.ParquetWriter(destino, archivo.schema_arrow, compression="zstd") as writer:
+            for lote in archivo.iter_batches(batch_size=filas_por_grupo):
+                writer.write_table(pa.Table.from_batches([lote]), row_group_size=filas_por_grupo)
+
+    return publicar_snapshot(escribir, ruta)
+
+
+def procesar_fragmento(tarea: tuple) -> dict:
+    """
+    Trabajo de un proceso: lee un row group RAW, lo aplana, valida, clasifica
+    por región, calcula columnas y escribe su fragmento en `staging`.
+    Las filas inválidas se excluyen sin volver a escribirlas en cuarentena
+    (ya quedaron registradas cuando se descargaron).
+    """
+    orden, cuenta, ruta, row_group, staging = tarea
+    inicio = time.perf_counter()
+
+    raw = pq.ParquetFile(ruta).read_row_group(row_group)
+    tabla, cuarentena, conteos = validar_tabla(flatten_table(raw, cuenta))
+    kept, discarded = clasificar_region_tabla(tabla)
+    df = calcular_columnas(tabla.to_pandas()) if tabla.num_rows else pd.DataFrame()
+
+    fragmento = os.path.join(staging, f"part-{orden:06d}.parquet")
+    df.to_parquet(fragmento, engine="pyarrow", index=False)
+    return {
+        "fragment": fragmento,
+        "pid": os.getpid(),
+        "rows_in": raw.num_rows,
+        "rows_out": len(df),
+        "quarantined": len(cuarentena),
+        "validation": conteos,
+        "kept": kept.num_rows,
+        "discarded": discarded.num_rows,
+        "seconds": time.perf_counter() - inicio,
+    }
+
+
+def _esquema_final(fragmentos: list[str]) -> pa.Schema:
+    """
+    Esquema común de los fragmentos más la columna índice 'ID' y los metadatos
+    de pandas, para que `pd.read_parquet` devuelva el índice como antes.
+    """
+    esquemas = [pq.read_schema(f) for f in fragmentos]
+    esquemas = [e for e in esquemas if len(e)]
+    if not esquemas:
+        return pa.schema([("ID", pa.int64())])
+    unido = pa.unify_schemas(
+        [e.remove_metadata() for e in esquemas], promote_options="permissive"
+    )
+    muestra = esquemas[0].empty_table().to_pandas()
+    for campo in unido:
+        if campo.name not in muestra:
+            muestra[campo.name] = pd.Series(dtype="object")
+    muestra.index = pd.Index([], dtype="int64", name="ID")
+    metadatos = pa.Schema.from_pandas(muestra[unido.names], preserve_index=True).metadata
+    return pa.schema(list(unido) + [pa.field("ID", pa.int64())], metadata=metadatos)
+
+
+def escribir_fragmentos(fragmentos: list[str], destino: str) -> dict:
+    """
+    Copia los fragmentos en orden a `destino` con un `ParquetWriter`,
+    numerando el índice 'ID' de forma continua. Solo hay un fragmento en
+    memoria a la vez. Los vuelos repetidos por 'Flight ID' se omiten y la
+    grilla se agrega por fragmento.
+
+    Returns
+    -------
+    dict con `rows` escritas, `duplicates` omitidos y `grid` (agregados parciales).
+    """
+    esquema = _esquema_final(fragmentos)
+    vistos, filas, duplicados, grilla = set(), 0, 0, []
+    with pq.ParquetWriter(destino, esquema, compression="zstd") as writer:
+        for fragmento in fragmentos:
+            tbl = pq.read_table(fragmento)
+            if tbl.num_rows == 0:
+                continue
+            if "Flight ID" in tbl.column_names:
+                nuevo = []
+                for vuelo in tbl["Flight ID"].to_pylist():
+                    nuevo.append(vuelo is None or vuelo not in vistos)
+                    vistos.add(vuelo)
+                duplicados += nuevo.count(False)
+                tbl = tbl.filter(pa.array(nuevo))
+            tbl = tbl.append_column("ID", pa.array(np.arange(filas, filas + tbl.num_rows), pa.int64()))
+            columnas = [
+                tbl[c] if c in tbl.column_names else pa.nulls(tbl.num_rows, esquema.field(c).type)
+                for c in esquema.names
+            ]
+            writer.write_table(pa.Table.from_arrays(columnas, schema=esquema))
+            grilla.append(agregar_grilla(
+                tbl.select([c for c in ("Longitud", "Latitude", "Air Seconds", "Air Hours") if c in tbl.column_names]).to_pandas()
+            ))
+            filas += tbl.num_rows
+    return {"rows": filas, "duplicates": duplicados, "grid": grilla}
+
+
+def reprocesar(
+    paquet_historico,
+    final_parquet,
+    grid_parquet=None,
+    workers: int | None = None,
+    default_account: str = "default",
+    filas_por_grupo: int = FILAS_POR_GRUPO,
+    legacy_account: str | None = None,
+) -> dict:
+    """
+    Reconstruye `final_parquet` a partir de todo el RAW en paralelo.
+    Lanza ValueError si no hay histórico RAW que reprocesar.
+    Los históricos con row groups de más de `filas_por_grupo` filas se
+    reagrupan antes (una sola vez) para repartirlos entre procesos.
+    Todo el reproceso corre con el bloqueo de `final_parquet`, el mismo que
+    toma `PipelineVuelos.ejecutar`: las ejecuciones del ETL esperan.
+    Con `legacy_account` (configuración con `accounts`) el histórico antiguo
+    se migra antes a esa cuenta, igual que en el ETL; si no, sus filas quedan
+    con `default_account`.
+
+    Returns
+    -------
+    dict con filas leídas/escritas, vuelos repetidos omitidos, conteos de
+    validación y región, tiempo total, filas por segundo por núcleo y detalle
+    por proceso (`per_worker`).
+    """
+    workers = workers or os.cpu_count() or 1
+    staging = f"{snapshot_dir(final_parquet)}.reprocess-{uuid.uuid4().hex[:8]}"
+
+    # Sin bloqueo, lo que el ETL agregue mientras tanto se perdería en el swap
+    with bloqueo_exclusivo(final_parquet):
+        if legacy_account:
+            migrar_historico_legado(paquet_historico, legacy_account)
+        tareas = []
+        for cuenta, ruta in raw_sources(paquet_historico, default_account):
+            snapshot = reagrupar_raw(ruta, filas_por_grupo)
+            for row_group in range(pq.ParquetFile(snapshot).num_row_groups):
+                tareas.append((len(tareas), cuenta, snapshot, row_group, staging))
+        if not tareas:
+            # Sin RAW no se publica nada: evita reemplazar FlightsFinal por uno vacío
+            raise ValueError(f"No hay histórico RAW en {paquet_historico}")
+        os.makedirs(staging)
+
+        inicio = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                partes = list(pool.map(procesar_fragmento, tareas))
+
+            # Ensamblado en el orden del RAW y swap atómico del snapshot final
+            resumen = {}
+            publicar_snapshot(
+                lambda destino: resumen.update(
+                    escribir_fragmentos([p["fragment"] for p in partes], destino)
+                ),
+                final_parquet,
+            )
+            if grid_parquet is not None:
+                publicar_grilla(combinar_grilla(resumen["grid"]), grid_parquet)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    total = time.perf_counter() - inicio
+
+    por_proceso = {}
+    for p in partes:
+        w = por_proceso.setdefault(p["pid"], {"rows": 0, "seconds": 0.0, "fragments": 0})
+        w["rows"] += p["rows_in"]
+        w["seconds"] += p["seconds"]
+        w["fragments"] += 1
+    for w in por_proceso.values():
+        w["rows_per_second"] = w["rows"] / w["seconds"] if w["seconds"] else 0.0
+
+    validacion = {}
+    for p in partes:
+        for codigo, n in p["validation"].items():
+            validacion[codigo] = validacion.get(codigo, 0) + n
+
+    filas = sum(p["rows_in"] for p in partes)
+    return {
+        "fragments": len(partes),
+        "rows_in": filas,
+        "rows_out": resumen["rows"],
+        "duplicates": resumen["duplicates"],
+        "quarantined": sum(p["quarantined"] for p in partes),
+        "validation": validacion,
+        "kept": sum(p["kept"] for p in partes),
+        "discarded": sum(p["discarded"] for p in partes),
+        "workers": workers,
+        "seconds": total,
+        "rows_per_second_per_core": filas / total / workers if total else 0.0,
+        "per_worker": por_proceso,
+    }
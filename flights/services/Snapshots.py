@@ -0,0 +1,239 @@
+# El objetivo principal de este script es publicar los Parquet del ETL como
+# snapshots inmutables: cada escritura crea un archivo versionado nuevo y luego
+# reemplaza de forma atómica el manifiesto que indica cuál es el vigente.
+# Los lectores siempre abren un snapshot completo aunque el ETL siga escribiendo.
+# La ruta lógica original también se mantiene al día (reemplazo atómico) para
+# los lectores que la abren directamente, como Power BI.
+# Quien reescribe una ruta a partir de su contenido vigente (ETL, reproceso)
+# toma antes `bloqueo_exclusivo` para no pisar lo que otro publicó entremedio.
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from .Metricas import registrar_bytes
+
+try:
+    import fcntl
+except ImportError:                          # Windows
+    fcntl = None
+    import msvcrt
+
+# Tiempo que se conserva un snapshot después de ser reemplazado
+RETENCION_SNAPSHOTS = timedelta(hours=24)
+
+MANIFIESTO = "CURRENT.json"
+
+
+def snapshot_dir(ruta) -> str:
+    """Carpeta de versiones de una ruta lógica: `FlightsFinal.parquet` ➜ `FlightsFinal.snapshots/`."""
+    return os.path.splitext(os.fspath(ruta))[0] + ".snapshots"
+
+
+@contextmanager
+def bloqueo_exclusivo(ruta, espera: float = 0.5):
+    """
+    Bloqueo exclusivo entre procesos asociado a la ruta lógica `ruta`
+    (archivo `<ruta sin extensión>.lock` junto a la carpeta de snapshots).
+    Espera a que lo libere quien lo tenga; se libera solo si el proceso muere.
+
+    Parameters
+    ----------
+    espera : float
+        Segundos entre intentos en Windows (`msvcrt` no tiene espera bloqueante).
+    """
+    archivo = os.path.splitext(os.fspath(ruta))[0] + ".lock"
+    os.makedirs(os.path.dirname(archivo) or ".", exist_ok=True)
+    with open(archivo, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(espera)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _leer_manifiesto(ruta) -> dict | None:
+    try:
+        with open(os.path.join(snapshot_dir(ruta), MANIFIESTO), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _escribir_atomico(destino: str, datos: dict):
+    """Escribe a un temporal y lo renombra; `os.replace` es atómico."""
+    tmp = f"{destino}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, destino)
+
+
+def snapshot_actual(ruta) -> str | None:
+    """
+    Ruta física del snapshot vigente de `ruta`.
+
+    Sin manifiesto se usa la ruta original si existe y no está vacía
+    (archivos escritos antes de los snapshots). Devuelve None si no hay datos.
+    """
+    manifiesto = _leer_manifiesto(ruta)
+    if manifiesto:
+        return os.path.join(snapshot_dir(ruta), manifiesto["current"])
+    ruta = os.fspath(ruta)
+    if os.path.exists(ruta) and os.path.getsize(ruta) > 0:
+        return ruta
+    return None
+
+
+def publicar_snapshot(escribir, ruta, retencion: timedelta = RETENCION_SNAPSHOTS) -> str:
+    """
+    Publica una nueva versión de `ruta`.
+
+    Parameters
+    ----------
+    escribir : callable(str)
+        Función que escribe el contenido completo en la ruta que recibe.
+    ruta : str | Path
+        Ruta lógica (p. ej. `settings.PARQUET_FINAL`).
+    retencion : timedelta
+        Los snapshots reemplazados hace más de este tiempo se eliminan.
+
+    Returns
+    -------
+    str  (ruta física del snapshot publicado)
+    """
+    carpeta = snapshot_dir(ruta)
+    os.makedirs(carpeta, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(os.fspath(ruta)))
+    ahora = datetime.now()
+    nombre = f"{stem}-{ahora:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}{ext}"
+
+    # 1) El contenido se escribe completo en un archivo que nadie lee aún
+    escribir(os.path.join(carpeta, nombre))
+    registrar_bytes(escritos=os.path.getsize(os.path.join(carpeta, nombre)))
+
+    # 2) Swap atómico del manifiesto; el anterior pasa a la lista de reemplazados
+    manifiesto = _leer_manifiesto(ruta) or {"current": None, "previous": []}
+    previos = manifiesto.get("previous", [])
+    if manifiesto.get("current"):
+        previos.append({
+            "file": manifiesto["current"],
+            "superseded_at": ahora.isoformat(timespec="seconds"),
+        })
+    _escribir_atomico(
+        os.path.join(carpeta, MANIFIESTO),
+        {"current": nombre, "created_at": ahora.isoformat(timespec="seconds"), "previous": previos},
+    )
+
+    # 3) La ruta lógica pasa a apuntar al mismo contenido
+    actualizar_ruta_logica(os.path.join(carpeta, nombre), ruta)
+
+    # 4) Limpieza de versiones antiguas
+    limpiar_snapshots(ruta, retencion)
+    return os.path.join(carpeta, nombre)
+
+
+def actualizar_ruta_logica(snapshot: str, ruta):
+    """
+    Reemplaza de forma atómica `ruta` por el contenido de `snapshot`.
+
+    Se usa un enlace duro (sin copiar datos) o una copia si el sistema de
+    archivos no lo permite, y luego `os.replace`. Quien tenga abierta la
+    versión anterior la sigue leyendo completa. Si el archivo está bloqueado
+    (Windows con el archivo abierto) se avisa y se reintenta en la próxima
+    publicación; el manifiesto ya apunta al snapshot nuevo.
+    """
+    ruta = os.fspath(ruta)
+    carpeta, nombre = os.path.split(ruta)
+    tmp = os.path.join(carpeta, f".{nombre}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        try:
+            os.link(snapshot, tmp)
+        except OSError:
+            shutil.copyfile(snapshot, tmp)
+        os.replace(tmp, ruta)
+    except OSError as e:
+        print(f"No se pudo actualizar {ruta}: {e}")
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def limpiar_snapshots(ruta, retencion: timedelta = RETENCION_SNAPSHOTS) -> list[str]:
+    """
+    Elimina los snapshots reemplazados hace más de `retencion` y los archivos
+    huérfanos (escrituras interrumpidas) más antiguos que `retencion`.
+    Si un archivo sigue abierto y no se puede borrar, se reintenta la próxima vez.
+
+    Returns
+    -------
+    list[str]  (nombres de archivos eliminados)
+    """
+    manifiesto = _leer_manifiesto(ruta)
+    if not manifiesto:
+        return []
+    carpeta = snapshot_dir(ruta)
+    limite = datetime.now() - retencion
+
+    conservar, eliminados = [], []
+    for previo in manifiesto.get("previous", []):
+        if datetime.fromisoformat(previo["superseded_at"]) <= limite:
+            try:
+                os.remove(os.path.join(carpeta, previo["file"]))
+                eliminados.append(previo["file"])
+                continue
+            except FileNotFoundError:
+                continue
+            except OSError:
+                pass
+        conservar.append(previo)
+
+    conocidos = {MANIFIESTO, manifiesto["current"]} | {p["file"] for p in conservar}
+    for nombre in os.listdir(carpeta):
+        ruta_archivo = os.path.join(carpeta, nombre)
+        if nombre in conocidos:
+            continue
+        try:
+            if datetime.fromtimestamp(os.path.getmtime(ruta_archivo)) <= limite:
+                os.remove(ruta_archivo)
+                eliminados.append(nombre)
+        except OSError:
+            pass
+
+    if len(conservar) != len(manifiesto.get("previous", [])):
+        manifiesto["previous"] = conservar
+        _escribir_atomico(os.path.join(carpeta, MANIFIESTO), manifiesto)
+    return eliminados
+
+
+def reemplazar_atomico(escribir, destino: str):
+    """
+    Escribe un fragmento nuevo de un dataset (p. ej. cuarentena) sin que los
+    lectores lo vean a medio escribir: se escribe con prefijo '.' (ignorado por
+    `pyarrow.dataset`) y se renombra al terminar.
+    """
+    carpeta, nombre = os.path.split(destino)
+    tmp = os.path.join(carpeta, f".{nombre}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        escribir(tmp)
+        registrar_bytes(escritos=os.path.getsize(tmp))
+        os.replace(tmp, destino)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,244 @@
+# El objetivo principal de este script es descargar la telemetría completa
+# (CSV de AirData) de los vuelos nuevos, simplificar cada trayectoria con
+# shapely y guardarla en un dataset columnar particionado por fecha de vuelo.
+# Las descargas fallidas quedan pendientes y se reintentan en la próxima ejecución.
+import io
+import json
+import os
+import shutil
+import threading
+import uuid
+import numpy as np
+import requests
+import shapely
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.dataset as ds
+from .Metricas import EjecutorHilos, registrar_bytes
+
+# Columnas de posición en el CSV de telemetría de AirData
+COL_LAT, COL_LON = "latitude", "longitude"
+
+# Intentos por vuelo antes de abandonar su telemetría (p. ej. un 404 permanente)
+MAX_INTENTOS = 5
+
+_local = threading.local()
+
+
+def _session(api_key: str | None) -> requests.Session:
+    """Una sesión HTTP por hilo (requests.Session no es segura entre hilos)."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        if api_key:
+            session.auth = (api_key, "")
+        _local.session = session
+    return session
+
+
+def parse_track(contenido: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Extrae (lon, lat) de un CSV de telemetría.
+    Descarta filas sin posición o en (0, 0), previas al fix de GPS.
+    """
+    tbl = pcsv.read_csv(
+        io.BytesIO(contenido),
+        convert_options=pcsv.ConvertOptions(
+            include_columns=[COL_LON, COL_LAT],
+            column_types={COL_LON: pa.float64(), COL_LAT: pa.float64()},
+        ),
+    )
+    lon = tbl[COL_LON].to_numpy(zero_copy_only=False)
+    lat = tbl[COL_LAT].to_numpy(zero_copy_only=False)
+    mask = ~(np.isnan(lon) | np.isnan(lat) | ((lon == 0) & (lat == 0)))
+    return lon[mask], lat[mask]
+
+
+def simplify_track(lon: np.ndarray, lat: np.ndarray, tolerance: float):
+    """Simplifica la trayectoria (Douglas-Peucker) con la tolerancia en grados."""
+    if len(lon) < 3 or not tolerance:
+        return lon, lat
+    linea = shapely.linestrings(np.column_stack([lon, lat]))
+    coords = shapely.get_coordinates(
+        shapely.simplify(linea, tolerance, preserve_topology=False)
+    )
+    return coords[:, 0], coords[:, 1]
+
+
+def _ruta_pendientes(output_dir: str, account: str | None) -> str:
+    # '_pendientes' empieza con '_': pyarrow.dataset lo ignora al leer las trayectorias
+    return os.path.join(output_dir, "_pendientes", f"{account or 'default'}.json")
+
+
+def cargar_pendientes(output_dir: str, account: str | None = None) -> list[dict]:
+    """Vuelos cuya telemetría falló antes: [{id, time, csvLink, attempts}]."""
+    try:
+        with open(_ruta_pendientes(output_dir, account), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def guardar_pendientes(output_dir: str, account: str | None, pendientes: list[dict]):
+    """Reemplaza de forma atómica la lista de pendientes de la cuenta."""
+    ruta = _ruta_pendientes(output_dir, account)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = f"{ruta}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(pendientes, f)
+    os.replace(tmp, ruta)
+
+
+def fetch_telemetry(
+    tbl_new: pa.Table,
+    cfg: dict,
+    output_dir: str,
+    account: str | None = None,
+    limite=None,
+    compression: str = "zstd",
+) -> dict:
+    """
+    Descarga y guarda la telemetría de los vuelos recién añadidos al RAW y
+    reintenta los que fallaron en ejecuciones anteriores. Como la marca de
+    agua del RAW ya pasó esos vuelos, los fallidos se anotan en
+    `<output_dir>/_pendientes/<cuenta>.json`; tras `max_attempts` intentos
+    (5 por defecto) se abandonan.
+
+    Parameters
+    ----------
+    tbl_new : pa.Table
+        Filas RAW nuevas (`save_raw_parquet_pa`); usa 'id', 'time' y 'csvLink'.
+    cfg : dict
+        Configuración de la cuenta. Lee `cfg["telemetry"]`:
+        • workers   ➜ descargas simultáneas (por defecto 8).
+        • tolerance ➜ tolerancia de simplificación en grados (por defecto 1e-5).
+        • max_attempts ➜ intentos por vuelo antes de abandonarlo (por defecto 5).
+    output_dir : str
+        Raíz del dataset de trayectorias (particionado `date=YYYY-MM-DD`).
+    limite : LimiteTasa | None
+        Límite de peticiones por segundo de la cuenta.
+
+    Returns
+    -------
+    dict con vuelos descargados, fallidos, reintentados, pendientes,
+    abandonados y puntos antes / después de simplificar.
+    """
+    opciones  = cfg.get("telemetry", {})
+    workers   = opciones.get("workers", 8)
+    tolerance = opciones.get("tolerance", 1e-5)
+    intentos_max = opciones.get("max_attempts", MAX_INTENTOS)
+    stats = {
+        "downloaded": 0, "failed": 0, "retried": 0, "pending": 0, "abandoned": 0,
+        "points_raw": 0, "points": 0,
+    }
+
+    # Pendientes de ejecuciones anteriores + vuelos nuevos (sin repetir ids)
+    candidatos = {p["id"]: p for p in cargar_pendientes(output_dir, account)}
+    stats["retried"] = len(candidatos)
+    if tbl_new.num_rows and "csvLink" in tbl_new.column_names:
+        for flight_id, time, link in zip(
+            tbl_new["id"].cast(pa.string()).to_pylist(),
+            tbl_new["time"].to_pylist(),
+            tbl_new["csvLink"].to_pylist(),
+        ):
+            if link:
+                candidatos.setdefault(
+                    flight_id, {"id": flight_id, "time": time, "csvLink": link, "attempts": 0}
+                )
+    if not candidatos:
+        return stats
+
+    vuelos = list(candidatos.values())
+    ids   = [v["id"] for v in vuelos]
+    links = [v["csvLink"] for v in vuelos]
+    dates = pc.cast(
+        pc.strptime(pa.array([v["time"] for v in vuelos], pa.string()),
+                    format="%Y-%m-%d %H:%M:%S", unit="s"),
+        pa.date32(),
+    ).to_pylist()
+
+    def _descargar(url):
+        if not url:
+            return None
+        if limite is not None:
+            limite.esperar()
+        try:
+            resp = _session(cfg.get("api_key")).get(url, timeout=30)
+            resp.raise_for_status()
+            registrar_bytes(leidos=len(resp.content))
+            lon, lat = parse_track(resp.content)
+        except Exception as e:
+            print(f"Error al descargar telemetría {url}: {e}")
+            return None
+        slon, slat = simplify_track(lon, lat, tolerance)
+        return len(lon), slon, slat
+
+    with EjecutorHilos(max_workers=workers) as pool:
+        tracks = list(pool.map(_descargar, links))
+
+    filas = {"id": [], "Account": [], "date": [], "points_raw": [], "lon": [], "lat": []}
+    pendientes = []
+    for vuelo, flight_id, date, track in zip(vuelos, ids, dates, tracks):
+        if track is None:
+            stats["failed"] += 1
+            intentos = vuelo["attempts"] + 1
+            if intentos < intentos_max:
+                pendientes.append({**vuelo, "attempts": intentos})
+            else:
+                stats["abandoned"] += 1
+                print(f"Telemetría del vuelo {flight_id} abandonada tras {intentos} intentos")
+            continue
+        n_raw, lon, lat = track
+        filas["id"].append(flight_id)
+        filas["Account"].append(account)
+        filas["date"].append(date)
+        filas["points_raw"].append(n_raw)
+        filas["lon"].append(lon)
+        filas["lat"].append(lat)
+        stats["downloaded"] += 1
+        stats["points_raw"] += n_raw
+        stats["points"] += len(lon)
+
+    stats["pending"] = len(pendientes)
+
+    if filas["id"]:
+        _escribir_trayectorias(filas, output_dir, compression)
+    # Los pendientes se actualizan cuando las trayectorias ya están guardadas
+    guardar_pendientes(output_dir, account, pendientes)
+    return stats
+
+
+def _escribir_trayectorias(filas: dict, output_dir: str, compression: str):
+    """Agrega las trayectorias descargadas al dataset particionado por fecha."""
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("Account", pa.string()),
+        ("date", pa.date32()),
+        ("points_raw", pa.int32()),
+        ("lon", pa.list_(pa.float64())),
+        ("lat", pa.list_(pa.float64())),
+    ])
+    tbl = pa.table(filas, schema=schema)
+    # Se escribe en una carpeta '_staging-*' (ignorada por pyarrow.dataset) y
+    # luego se mueve cada fragmento completo a su partición con os.replace.
+    staging = os.path.join(output_dir, f"_staging-{uuid.uuid4().hex[:12]}")
+    ds.write_dataset(
+        tbl,
+        staging,
+        format="parquet",
+        partitioning=["date"],
+        partitioning_flavor="hive",
+        basename_template=f"track-{uuid.uuid4().hex[:12]}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+    )
+    for particion in os.listdir(staging):
+        os.makedirs(os.path.join(output_dir, particion), exist_ok=True)
+        for nombre in os.listdir(os.path.join(staging, particion)):
+            registrar_bytes(escritos=os.path.getsize(os.path.join(staging, particion, nombre)))
+            os.replace(
+                os.path.join(staging, particion, nombre),
+                os.path.join(output_dir, particion, nombre),
+            )
+    shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,171 @@
+# El objetivo principal de este script es validar cada lote de vuelos antes
+# de procesarlo. Las reglas se evalúan como máscaras por columna sobre todo el
+# lote y las filas que fallan se envían al dataset de cuarentena con su motivo.
+import os
+import uuid
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from .Snapshots import reemplazar_atomico
+
+
+def _numero(df: pd.DataFrame, col: str) -> pd.Series:
+    """Columna convertida a float; NaN si no existe o no es numérica."""
+    if col not in df.columns:
+        return pd.Series(float("nan"), index=df.index)
+    return pd.to_numeric(df[col], errors="coerce")
+
+
+def _limite_utc(valor):
+    """Convierte un extremo de la ventana de consulta a Timestamp UTC."""
+    if valor is None or valor == "":
+        return None
+    ts = pd.Timestamp(valor)
+    # La API recibe la ventana sin zona horaria y la interpreta en UTC
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def regla_sin_coordenadas(df, ventana):
+    """Latitud o longitud de despegue ausente o no numérica."""
+    return _numero(df, "Latitude").isna() | _numero(df, "Longitud").isna()
+
+
+def regla_bateria_negativa(df, ventana):
+    """Uso de batería negativo (aterriza con más carga que al despegar)."""
+    return (_numero(df, "Takeoff Bat %") - _numero(df, "Landing Bat %")) < 0
+
+
+def regla_aire_mayor_log(df, ventana):
+    """Segundos en el aire mayores que la duración total del log."""
+    return _numero(df, "Air Seconds") > _numero(df, "Air+Ground Seconds")
+
+
+def regla_fecha_fuera_ventana(df, ventana):
+    """Fecha del vuelo ausente o fuera de la ventana consultada a la API."""
+    if "Flight/Service Date" not in df.columns:
+        return pd.Series(True, index=df.index)
+    fechas = pd.to_datetime(df["Flight/Service Date"], utc=True, errors="coerce")
+    inicio, fin = (_limite_utc(v) for v in (ventana or (None, None)))
+    mask = fechas.isna()
+    if inicio is not None:
+        mask |= fechas < inicio
+    if fin is not None:
+        mask |= fechas > fin
+    return mask
+
+
+# Reglas declarativas: (código de motivo, descripción, máscara de fallo)
+REGLAS = [
+    ("sin_coordenadas", "Latitud o longitud ausente", regla_sin_coordenadas),
+    ("bateria_negativa", "Uso % Bat negativo", regla_bateria_negativa),
+    ("aire_mayor_log", "Air Seconds > Air+Ground Seconds", regla_aire_mayor_log),
+    ("fecha_fuera_ventana", "Fecha fuera del rango consultado", regla_fecha_fuera_ventana),
+]
+
+
+def evaluar_reglas(df: pd.DataFrame, ventana=(None, None), reglas=REGLAS):
+    """
+    Evalúa las reglas y devuelve (máscara de fallo, motivos, conteos).
+    `motivos` solo tiene las filas que fallan, con códigos separados por ';'.
+    """
+    conteos = {codigo: 0 for codigo, _, _ in reglas}
+    if df.empty:
+        return pd.Series(False, index=df.index), pd.Series(dtype="string"), conteos
+
+    fallos = pd.DataFrame(
+        {codigo: regla(df, ventana).fillna(False).astype(bool) for codigo, _, regla in reglas},
+        index=df.index,
+    )
+    conteos.update({codigo: int(n) for codigo, n in fallos.sum().items()})
+
+    mask = fallos.any(axis=1)
+    motivos = fallos[mask].dot(fallos.columns + ";").str.rstrip(";")
+    return mask, motivos, conteos
+
+
+def validar_lote(df: pd.DataFrame, ventana=(None, None), reglas=REGLAS):
+    """
+    Aplica las reglas de validación sobre un lote completo.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Lote con las columnas de `save_flights_to_parquet`.
+    ventana : tuple(str | None, str | None)
+        Rango (start, end) consultado a la API.
+    reglas : list
+        Lista de tuplas (código, descripción, función máscara).
+
+    Returns
+    -------
+    validos : pd.DataFrame
+        Filas que pasan todas las reglas.
+    cuarentena : pd.DataFrame
+        Filas rechazadas con la columna extra 'Motivo' (códigos separados por ';').
+    conteos : dict[str, int]
+        Filas que fallan cada regla (una fila puede fallar varias).
+    """
+    mask, motivos, conteos = evaluar_reglas(df, ventana, reglas)
+    return df[~mask], df[mask].assign(Motivo=motivos), conteos
+
+
+# Columnas que leen las reglas (lo único que se convierte a pandas en `validar_tabla`)
+COLUMNAS_REGLAS = [
+    "Flight/Service Date",
+    "Air Seconds",
+    "Air+Ground Seconds",
+    "Takeoff Bat %",
+    "Landing Bat %",
+    "Latitude",
+    "Longitud",
+]
+
+
+def validar_tabla(tbl: pa.Table, ventana=(None, None), reglas=REGLAS):
+    """
+    Igual que `validar_lote` pero sobre un `pa.Table`: solo las columnas de
+    las reglas pasan a pandas y el lote válido se obtiene filtrando la tabla
+    Arrow. La cuarentena se devuelve como DataFrame (suele ser pequeña).
+    """
+    cols = [c for c in COLUMNAS_REGLAS if c in tbl.column_names]
+    mask, motivos, conteos = evaluar_reglas(tbl.select(cols).to_pandas(), ventana, reglas)
+    if not mask.any():
+        return tbl, pd.DataFrame(), conteos
+    fallo = pa.array(mask.to_numpy())
+    cuarentena = tbl.filter(fallo).to_pandas().assign(Motivo=motivos.to_numpy())
+    return tbl.filter(pc.invert(fallo)), cuarentena, conteos
+
+
+def guardar_cuarentena(
+    cuarentena: pd.DataFrame,
+    directorio: str,
+    compression: str = "zstd",
+) -> str | None:
+    """
+    Agrega las filas rechazadas al dataset Parquet de cuarentena.
+
+    Cada lote se escribe como un fragmento nuevo dentro de `directorio`, de
+    modo que el dataset completo se lee con `pyarrow.dataset.dataset(directorio)`.
+    Las columnas originales se guardan como texto para que todos los
+    fragmentos compartan el mismo esquema.
+
+    Returns
+    -------
+    str | None  (ruta del fragmento escrito o None si no había filas)
+    """
+    if cuarentena.empty:
+        return None
+
+    df = cuarentena.astype("string")
+    df["Fecha Cuarentena"] = pd.Timestamp(datetime.now())
+
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"cuarentena-{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+    ruta = os.path.join(directorio, nombre)
+    tbl = pa.Table.from_pandas(df, preserve_index=False)
+    reemplazar_atomico(
+        lambda destino: pq.write_table(tbl, destino, compression=compression), ruta
+    )
+    return ruta
@@ -5,4 +5,6 @@ urlpatterns = [
     path('dashboard/', views.dashboard_view, name='dashboard'),
     path('download/', views.download_parquet, name='download_parquet'),
     path('refresh/', views.refresh_data, name='refresh_data'),
+    path('grid/<int:zoom>/', views.grid_tiles, name='grid_tiles'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
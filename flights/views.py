@@ -1,18 +1,26 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import FileResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.conf import settings
+import hmac
+import math
 import os
 from .dashboard import run_etl
+from .services.Grilla import ZOOM_CELDA_M, celdas_zoom
+from .services.Snapshots import snapshot_actual
+from .services.Metricas import REGISTRO, medir_vista
 
 @login_required
 def dashboard_view(request):
     return render(request, 'dashboard.html')
 
 @login_required
+@medir_vista('refresh')
 def refresh_data(request):
+    # ?profile=1 perfila la ejecución; solo para el personal (staff)
+    profile = request.GET.get('profile') == '1' and request.user.is_staff
     try:
-        stats = run_etl()
+        stats = run_etl(profile=profile)
 
         start, end = (None, None)
         if isinstance(stats.get('range'), (list, tuple)):
@@ -20,9 +28,12 @@ def refresh_data(request):
         message = (
             f"Vuelos nuevos: {stats['fetched']} | "
             f"Antofagasta: {stats['kept']} |"
-            f"Descartados: {stats['discarded']} (fuera de la región)"
+            f"Descartados: {stats['discarded']} (fuera de la región) | "
+            f"Cuarentena: {stats['quarantined']} | "
              
             f"Rango: {start} → {end}")
+        if stats.get('profile'):
+            message += f" | Perfil: {stats['profile']}"
 
 
     except Exception as e:
@@ -30,12 +41,52 @@ def refresh_data(request):
     return render(request, 'dashboard.html', {'message': message})
 
 @login_required
+@medir_vista('download')
 def download_parquet(request):
-    path = settings.PARQUET_FINAL
-    if os.path.exists(path):
+    # Se abre el snapshot vigente; el ETL puede publicar otro mientras se descarga
+    path = snapshot_actual(settings.PARQUET_FINAL)
+    if path is not None:
         return FileResponse(
             open(path, "rb"),
             as_attachment=True,
-            filename=os.path.basename(path),
+            filename=os.path.basename(settings.PARQUET_FINAL),
         )
     return render(request, 'dashboard.html', {'error': 'Archivo no encontrado.'})
+
+@login_required
+def grid_tiles(request, zoom):
+    if zoom not in ZOOM_CELDA_M:
+        return JsonResponse(
+            {'error': f'Zoom no disponible. Use uno de {sorted(ZOOM_CELDA_M)}.'},
+            status=404,
+        )
+    bbox = None
+    if request.GET.get('bbox'):
+        try:
+            bbox = tuple(float(v) for v in request.GET['bbox'].split(','))
+            if len(bbox) != 4 or not all(math.isfinite(v) for v in bbox):
+                raise ValueError
+        except ValueError:
+            return JsonResponse(
+                {'error': 'bbox debe ser lon_min,lat_min,lon_max,lat_max.'},
+                status=400,
+            )
+    return JsonResponse(
+        celdas_zoom(settings.PARQUET_GRID, zoom, bbox),
+        json_dumps_params={'separators': (',', ':')},
+    )
+
+def metrics_view(request):
+    # Con METRICS_TOKEN el scraper se autentica con `Authorization: Bearer <token>`;
+    # sin token solo el personal con sesión iniciada puede ver las métricas
+    token = settings.METRICS_TOKEN
+    if token:
+        enviado = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(enviado.encode(), token.encode()):
+            return HttpResponse('No autorizado.', status=401, content_type='text/plain')
+    elif not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse('No autorizado.', status=403, content_type='text/plain')
+    return HttpResponse(
+        REGISTRO.exportar_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,35 +1,50 @@
 # main.py
+import argparse
 import os
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rommex.settings")
+import django
+django.setup()                       # aplica LOGGING (línea JSON por ejecución)
 from django.conf import settings
-from flights.services.ObtenerVuelos import main as obtener_vuelos
-from flights.services.Procesar import procesar_datos
-from flights.services.Clean import filtrar_region_antofagasta
+from flights.dashboard import run_etl
+from flights.services.Metricas import exportar_archivo
 
-def main() -> None:
+def main(argv=None) -> None:
     """Execute the full ETL process using project settings."""
-
-    new_tbl, df_new, stats = obtener_vuelos(
-        settings.JSON_CONFIG,
-        settings.PARQUET_HISTORICO,
-        settings.PARQUET_API,
+    parser = argparse.ArgumentParser(description="Ejecuta el ETL de vuelos.")
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Repite el ETL desde las páginas de la API guardadas en caché, sin red.",
+    )
+    parser.add_argument(
+        "--replay-dir",
+        help="Carpeta vacía para las salidas del replay (por defecto data/replay/<fecha>/).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Perfila cada etapa (cProfile + tracemalloc) y guarda el reporte en data/profiles/.",
     )
-    #records = df_new.to_dict("records") if not df_new.empty else []
-    #kept, discarded = filtrar_region_antofagasta(records)
-    #print(
-    #    f"Nuevos vuelos: {new_tbl.num_rows} | "
-    #    f"En Antofagasta: {len(kept)} | "
-    #    f"Descartados fuera de la región: {len(discarded)}"
-    #)
+    args = parser.parse_args(argv)
 
-    #procesar_datos(settings.PARQUET_API, settings.PARQUET_FINAL)
+    if args.replay_dir and not args.replay:
+        parser.error("--replay-dir solo se usa con --replay")
+    try:
+        stats = run_etl(replay=args.replay, profile=args.profile, output_dir=args.replay_dir)
+    finally:
+        if settings.METRICS_TEXTFILE:
+            # este proceso termina aquí: sus métricas no llegan a /metrics
+            exportar_archivo(settings.METRICS_TEXTFILE)
 
-    #total = stats.get("total") if isinstance(stats, dict) else "?"
-    #start, end = (None, None)
-    #if isinstance(stats.get("requested_range"), (list, tuple)):
-    #    start, end = stats["requested_range"]
-    #print(f"ETL completado. Vuelos procesados: {total}")
-    #print(f"Rango consultado: {start} → {end}")
+    start, end = (None, None)
+    if isinstance(stats.get("range"), (list, tuple)):
+        start, end = stats["range"]
+    print(f"ETL completado. Vuelos nuevos: {stats['fetched']}")
+    print(f"Rango consultado: {start} → {end}")
+    if stats.get("output_dir"):
+        print(f"Salidas del replay: {stats['output_dir']}")
+    if stats.get("profile"):
+        print(f"Perfil: {stats['profile']}")
 
 
 if __name__ == "__main__":
@@ -72,8 +72,32 @@ TEMPLATES = [
 ]
 PARQUET_FINAL = BASE_DIR / 'data/FlightsFinal.parquet'
 PARQUET_API = BASE_DIR / 'data/flights_api.parquet'
+# Escribe el batch aplanado en PARQUET_API (solo para depuración)
+ETL_CHECKPOINT = os.environ.get("ETL_CHECKPOINT") == "1"
 PARQUET_HISTORICO = BASE_DIR / 'data/historico.parquet'
 JSON_CONFIG = BASE_DIR / 'data/config.json'
+PARQUET_QUARANTINE = BASE_DIR / 'data/quarantine'
+TELEMETRY_DIR = BASE_DIR / 'data/telemetry'
+PARQUET_GRID = BASE_DIR / 'data/grid.parquet'
+API_CACHE_DIR = BASE_DIR / 'data/api_cache'
+# Salidas de `main.py --replay` (una carpeta nueva por ejecución)
+REPLAY_DIR = BASE_DIR / 'data/replay'
+# Reportes de `main.py --profile` y de `refresh/?profile=1` (solo staff)
+PROFILE_DIR = BASE_DIR / 'data/profiles'
+# Token para /metrics (Prometheus); sin token solo el personal puede consultarlas
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+# `/metrics` solo ve las ejecuciones hechas por el servidor web; `main.py`
+# escribe sus métricas en este archivo (textfile collector de node_exporter)
+METRICS_TEXTFILE = os.environ.get("METRICS_TEXTFILE")
+
+# Cada ejecución del ETL deja una línea JSON en el logger `flights.etl`
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"plano": {"format": "%(message)s"}},
+    "handlers": {"consola": {"class": "logging.StreamHandler", "formatter": "plano"}},
+    "loggers": {"flights.etl": {"handlers": ["consola"], "level": "INFO", "propagate": False}},
+}
 
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
@@ -0,0 +1,142 @@
+import json
+import os
+from datetime import datetime, timedelta
+from flights.services.Cache import NIVEL_DESALOJO, CachePaginas
+from flights.services.ObtenerVuelos import fetch_account, fetch_flights
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.content = json.dumps(payload).encode("utf-8")
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Sesión de prueba; `pages=None` simula que no hay red."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.auth = None
+        self.headers = {}
+        self.calls = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def get(self, url, params=None, timeout=None):
+        if self.pages is None:
+            raise ConnectionError("sin red")
+        self.calls += 1
+        return FakeResponse(self.pages[params["offset"] // params["limit"]])
+
+
+PAGES = [
+    {"data": [{"id": 1}], "moreResultsAvailable": True},
+    {"data": [{"id": 2}], "moreResultsAvailable": False},
+]
+CFG = {"api_key": "k", "name": "a", "page_size": 1}
+
+
+def test_cache_ventanas_y_replay(monkeypatch, tmp_path):
+    session = FakeSession(PAGES)
+    monkeypatch.setattr("flights.services.ObtenerVuelos.requests.Session", lambda: session)
+    cache = CachePaginas(tmp_path)
+
+    cerrada = {"start": "2024-06-01 00:00:00", "end": "2024-06-02 00:00:00"}
+    abierta = {"start": "2024-06-02 00:00:00", "end": "2999-01-01 00:00:00"}
+
+    # Ventana cerrada: la segunda vez se sirve desde la caché
+    fetch_flights(cerrada, CFG, cache=cache)
+    fetch_flights(cerrada, CFG, cache=cache)
+    assert session.calls == 2
+
+    # Ventana abierta: siempre se vuelve a pedir
+    fetch_flights(abierta, CFG, cache=cache)
+    fetch_flights(abierta, CFG, cache=cache)
+    assert session.calls == 6
+
+    # Replay sin red: repite las consultas registradas desde la caché
+    monkeypatch.setattr(
+        "flights.services.ObtenerVuelos.requests.Session", lambda: FakeSession(None)
+    )
+    replay = CachePaginas(tmp_path, replay=True)
+    vuelos, stats = fetch_flights(abierta, CFG, cache=replay)
+    assert [v["id"] for v in vuelos] == [1, 2]
+    assert len(replay.consultas("a")) == 3
+
+
+def test_cache_desalojo_lru(tmp_path):
+    cache = CachePaginas(tmp_path)
+    query = {"end": "2000-01-01 00:00:00"}
+    for offset in (0, 1):
+        cache.guardar("u", query, offset, 1, {"data": [offset]})
+    # la página 0 se usó hace 10 s, la página 1 hace 1000 s
+    for offset, edad in ((0, 10), (1, 1000)):
+        ruta = cache._ruta(cache.clave("u", query, offset, 1))
+        os.utime(ruta, (0, os.path.getmtime(ruta) - edad))
+    assert cache.obtener("u", query, 0, 1) == {"data": [0]}
+
+    # caben dos páginas bajo el nivel de desalojo: al guardar la tercera se
+    # desaloja solo la menos usada (1)
+    cache.max_bytes = int(cache._total / NIVEL_DESALOJO) + 1
+    cache.guardar("u", query, 2, 1, {"data": [2]})
+    assert cache.obtener("u", query, 1, 1) is None
+    assert cache.obtener("u", query, 0, 1) == {"data": [0]}
+    assert cache.obtener("u", query, 2, 1) == {"data": [2]}
+
+
+def test_cache_llena_no_recorre_el_disco_en_cada_escritura(monkeypatch, tmp_path):
+    cache = CachePaginas(tmp_path)
+    query = {"end": "2000-01-01 00:00:00"}
+    cache.guardar("u", query, 0, 1, {"data": [0]})
+    pagina = cache._total
+    cache.max_bytes = pagina * 100
+
+    recorridos = []
+    desalojar = cache._desalojar
+    monkeypatch.setattr(cache, "_desalojar", lambda: (recorridos.append(1), desalojar()))
+    for offset in range(1, 300):
+        cache.guardar("u", query, offset, 1, {"data": [offset]})
+
+    assert cache._total <= cache.max_bytes
+    # cada recorrido libera ~10 % del máximo (~10 páginas); desalojando solo
+    # hasta `max_bytes` habría uno por escritura después de llenarse (~200)
+    assert 0 < len(recorridos) <= 25
+
+
+def test_fetch_account_repetido_lee_dias_cerrados_de_cache(monkeypatch, tmp_path):
+    class SesionVacia(FakeSession):
+        def get(self, url, params=None, timeout=None):
+            self.calls += 1
+            self.ends.append(params["end"])
+            return FakeResponse({"data": [], "moreResultsAvailable": False})
+
+    session = SesionVacia(None)
+    session.ends = []
+    monkeypatch.setattr("flights.services.ObtenerVuelos.requests.Session", lambda: session)
+    hace_30_dias = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+    monkeypatch.setattr(
+        "flights.services.ObtenerVuelos.get_last_flight_timestamp", lambda path: hace_30_dias
+    )
+    cache = CachePaginas(tmp_path / "cache")
+    raw = str(tmp_path / "historico.parquet")
+
+    fetch_account(CFG, raw, cache=cache)
+    assert session.calls > 20                 # ~23 días cerrados + tramo abierto
+
+    session.calls, session.ends = 0, []
+    _, stats = fetch_account(CFG, raw, cache=cache)
+    assert session.calls == 1                 # solo el tramo abierto va a la API
+    assert not cache.es_cerrada({"end": session.ends[0]})
+    assert stats["requested_range"][0] == hace_30_dias[:10] + " 00:00:00"
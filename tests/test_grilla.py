@@ -0,0 +1,42 @@
+import pandas as pd
+from flights.services.Grilla import actualizar_grilla, celdas_zoom
+
+
+def test_actualizar_grilla_incremental(tmp_path):
+    grid = tmp_path / "grid.parquet"
+    lote = pd.DataFrame({
+        "Longitud": [-70.40, -70.40, -68.90, None],
+        "Latitude": [-23.65, -23.65, -22.45, -23.0],
+        "Air Hours": [0.5, 0.25, 1.0, 2.0],
+    })
+
+    actualizar_grilla(lote, str(grid))
+    actualizar_grilla(lote.iloc[:1], str(grid))
+
+    tile = celdas_zoom(str(grid), 10)
+    assert tile["cell_size"] == 1_000
+    assert sorted(c[2:] for c in tile["cells"]) == [[1, 1.0], [3, 1.25]]
+
+    # bbox alrededor de Antofagasta ciudad
+    tile = celdas_zoom(str(grid), 10, (-70.5, -23.7, -70.3, -23.6))
+    assert [c[2:] for c in tile["cells"]] == [[3, 1.25]]
+
+    # bbox de todo el mundo (latitud ±90) y un vuelo en el polo no rompen la proyección
+    tile = celdas_zoom(str(grid), 10, (-180, -90, 180, 90))
+    assert sorted(c[2:] for c in tile["cells"]) == [[1, 1.0], [3, 1.25]]
+    polo = pd.DataFrame({"Longitud": [0.0], "Latitude": [90.0], "Air Hours": [1.0]})
+    assert actualizar_grilla(polo, str(grid))["flights"].sum() == 4 * 5
+
+
+def test_grilla_suma_horas_desde_segundos(tmp_path):
+    grid = tmp_path / "grid.parquet"
+    # Cuatro vuelos de 60 s: 'Air Hours' redondeada (0.02) sumaría 0.08 h
+    lote = pd.DataFrame({
+        "Longitud": [-70.40] * 4,
+        "Latitude": [-23.65] * 4,
+        "Air Seconds": [60.0] * 4,
+        "Air Hours": [0.02] * 4,
+    })
+    grilla = actualizar_grilla(lote, str(grid))
+    assert grilla.query("zoom == 10")["air_hours"].iloc[0] == 240 / 3600
+    assert [c[2:] for c in celdas_zoom(str(grid), 10)["cells"]] == [[4, 0.07]]
@@ -0,0 +1,89 @@
+import json
+import logging
+import threading
+from flights.services import ObtenerVuelos
+from flights.services.Metricas import (
+    EjecutorHilos,
+    Registro,
+    exportar_archivo,
+    medir_etapa,
+    registrar_bytes,
+    REGISTRO,
+)
+from flights.services.Pipeline import PipelineVuelos
+
+
+def test_exportar_prometheus():
+    registro = Registro()
+    registro.describir("x_total", "counter", "Contador.")
+    registro.describir("x_seconds", "histogram", "Histograma.", (0.5, 1))
+    registro.incrementar("x_total", 2, stage="a")
+    registro.observar("x_seconds", 0.7, stage="a")
+
+    texto = registro.exportar_prometheus()
+    assert "# TYPE x_total counter" in texto
+    assert 'x_total{stage="a"} 2' in texto
+    assert 'x_seconds_bucket{stage="a",le="0.5"} 0' in texto
+    assert 'x_seconds_bucket{stage="a",le="1"} 1' in texto
+    assert 'x_seconds_bucket{stage="a",le="+Inf"} 1' in texto
+    assert 'x_seconds_count{stage="a"} 1' in texto
+
+
+def test_medir_etapa_atribuye_bytes():
+    with medir_etapa("prueba") as m:
+        registrar_bytes(leidos=10, escritos=4)
+        registrar_bytes(leidos=5)
+    registrar_bytes(leidos=99)               # fuera de una etapa no se atribuye
+    assert (m["bytes_read"], m["bytes_written"]) == (15, 4)
+    assert m["duration_seconds"] >= 0
+    assert 'rommex_etl_stage_bytes_read_total{stage="prueba"} 15' in REGISTRO.exportar_prometheus()
+
+
+def test_bytes_por_ejecucion_en_paralelo(tmp_path):
+    # Dos ejecuciones simultáneas: cada una ve solo sus bytes, también los de sus hilos
+    medidas, listas = {}, threading.Barrier(2)
+
+    def ejecucion(nombre, n):
+        with medir_etapa(nombre) as m:
+            listas.wait()
+            with EjecutorHilos(max_workers=2) as pool:
+                list(pool.map(lambda _: registrar_bytes(leidos=n), range(4)))
+            listas.wait()
+        medidas[nombre] = m["bytes_read"]
+
+    hilos = [threading.Thread(target=ejecucion, args=a) for a in (("uno", 1), ("dos", 10))]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert medidas == {"uno": 4, "dos": 40}
+
+    exportar_archivo(tmp_path / "rommex.prom")
+    assert 'rommex_etl_stage_bytes_read_total{stage="dos"} 40' in (tmp_path / "rommex.prom").read_text()
+
+
+def test_pipeline_linea_json(monkeypatch, tmp_path, caplog):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"api_key": "k"}))
+
+    def fake_fetch(query, cfg, limite=None, cache=None):
+        return [], {"requested_range": (None, "2024-06-02 00:00:00"), "total": 0, "pages": 1, "retries": 0}
+
+    monkeypatch.setattr(ObtenerVuelos, "fetch_flights", fake_fetch)
+    pipeline = PipelineVuelos(
+        str(config),
+        str(tmp_path / "historico.parquet"),
+        str(tmp_path / "FlightsFinal.parquet"),
+        str(tmp_path / "quarantine"),
+        str(tmp_path / "grid.parquet"),
+    )
+    with caplog.at_level(logging.INFO, logger="flights.etl"):
+        pipeline.ejecutar()
+
+    registro = json.loads(caplog.records[-1].getMessage())
+    assert registro["status"] == "ok"
+    assert [e["stage"] for e in registro["stages"]] == [
+        "obtener", "aplanar", "validar", "clasificar_region", "procesar"
+    ]
+    assert registro["http"]["default"] == {"pages": 1, "retries": 0}
+    assert 'rommex_etl_runs_total{status="ok"}' in REGISTRO.exportar_prometheus()
@@ -46,4 +46,38 @@ def test_fetch_flights_pagination(monkeypatch):
 
     assert [r["id"] for r in records] == [1, 2]
     assert stats["total"] == 2
-    assert stats["requested_range"] == ("2024-06-01", "2024-06-02")
\ No newline at end of file
+    assert stats["requested_range"] == ("2024-06-01", "2024-06-02")
+
+def test_main_multiple_accounts(monkeypatch, tmp_path):
+    from flights.services import ObtenerVuelos
+
+    cfg = {
+        "base_url": "http://t",
+        "accounts": [
+            {"name": "a", "api_key": "ka", "rate_limit": 100},
+            {"name": "b", "api_key": "kb"},
+        ],
+    }
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps(cfg))
+
+    def fake_fetch(query, account_cfg, limite=None, cache=None):
+        flight = {
+            "id": account_cfg["api_key"],
+            "time": "2024-06-01 16:00:00",
+            "timeISO": "2024-06-01T16:00:00Z",
+        }
+        return [flight], {"requested_range": (query["start"], query["end"]), "total": 1}
+
+    monkeypatch.setattr(ObtenerVuelos, "fetch_flights", fake_fetch)
+
+    historico = tmp_path / "historico.parquet"
+    api = tmp_path / "flights_api.parquet"
+    nuevos, df, stats = ObtenerVuelos.main(str(config), str(historico), str(api))
+
+    assert {name: tbl.num_rows for name, tbl in nuevos.items()} == {"a": 1, "b": 1}
+    assert sorted(df["Account"]) == ["a", "b"]
+    assert stats["total"] == 2
+    for name in ("a", "b"):
+        raw = tmp_path / "historico" / f"account={name}" / "historico.parquet"
+        assert ObtenerVuelos.get_last_flight_timestamp(str(raw)) == "2024-06-01 16:00:00"
@@ -0,0 +1,82 @@
+import os
+import pstats
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from flights.services.Metricas import EjecutorHilos
+from flights.services.Perfilado import PerfilEjecucion
+
+
+def trabajo_en_hilo(n):
+    return sum(i * i for i in range(n))
+
+
+def trabajo_ajeno(n):
+    return sum(i for i in range(n))
+
+
+def test_perfil_por_etapa(tmp_path):
+    perfil = PerfilEjecucion(tmp_path, top=5)
+    with pytest.raises(RuntimeError):
+        with perfil.etapa("fuera"):
+            pass
+
+    with perfil:
+        with perfil.etapa("obtener"):
+            with EjecutorHilos(max_workers=2) as pool:
+                list(pool.map(trabajo_en_hilo, [50_000, 50_000]))
+            # Un hilo que no es del pipeline (otra petición del servidor) no se perfila
+            with ThreadPoolExecutor(max_workers=1) as ajeno:
+                ajeno.submit(trabajo_ajeno, 50_000).result()
+        with perfil.etapa("procesar"):
+            datos = [list(range(100)) for _ in range(1000)]
+        del datos
+
+    archivos = sorted(os.listdir(perfil.carpeta))
+    assert archivos == ["01-obtener.pstats", "02-procesar.pstats", "allocations.txt", "stacks.collapsed"]
+
+    # El trabajo hecho en los hilos del pool también queda perfilado
+    stats = pstats.Stats(os.path.join(perfil.carpeta, "01-obtener.pstats"))
+    nombres = {nombre for _, _, nombre in stats.stats}
+    assert "trabajo_en_hilo" in nombres
+    assert "trabajo_ajeno" not in nombres
+
+    with open(os.path.join(perfil.carpeta, "stacks.collapsed"), encoding="utf-8") as f:
+        lineas = f.read().splitlines()
+    assert lineas and all(l.rsplit(" ", 1)[1].isdigit() for l in lineas)
+    assert any(l.startswith("obtener;") and "trabajo_en_hilo" in l for l in lineas)
+    assert any(l.startswith("procesar;") for l in lineas)
+
+    with open(os.path.join(perfil.carpeta, "allocations.txt"), encoding="utf-8") as f:
+        resumen = f.read()
+    assert "== obtener" in resumen and "== procesar" in resumen
+
+
+def test_ejecuciones_perfiladas_de_a_una(tmp_path):
+    primera, segunda = PerfilEjecucion(tmp_path), PerfilEjecucion(tmp_path)
+    entro = threading.Event()
+
+    def otra_ejecucion():
+        with segunda:
+            entro.set()
+
+    with primera:
+        hilo = threading.Thread(target=otra_ejecucion)
+        hilo.start()
+        assert not entro.wait(0.2)            # espera a que termine la primera
+    hilo.join()
+    assert entro.is_set()
+
+
+def test_perfil_rechazado_con_otros_hilos_en_python_312(monkeypatch, tmp_path):
+    monkeypatch.setattr("flights.services.Perfilado.PERFIL_POR_PROCESO", True)
+    liberar = threading.Event()
+    hilo = threading.Thread(target=liberar.wait)      # otra petición del servidor
+    hilo.start()
+    try:
+        with pytest.raises(RuntimeError):
+            PerfilEjecucion(tmp_path)
+        assert os.listdir(tmp_path) == []
+    finally:
+        liberar.set()
+        hilo.join()
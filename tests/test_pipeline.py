@@ -0,0 +1,98 @@
+import json
+import pandas as pd
+import pyarrow as pa
+from flights.services import ObtenerVuelos
+from flights.services.ObtenerVuelos import flatten_table
+from flights.services.Pipeline import PipelineVuelos
+from flights.services.Snapshots import snapshot_actual
+
+
+def _vuelo(id_, lat, air, log):
+    return {
+        "id": id_,
+        "time": "2024-06-01 16:00:00",
+        "timeISO": "2024-06-01T16:00:00Z",
+        "duration": {"airDuration": air, "logDuration": log},
+        "participants": {"data": [{"name": "Luciano Erazo", "role": "Pilot-in-Command"}]},
+        "drone": {"name": "DroneX"},
+        "batteryPercent": {"takeOff": 100, "landing": 70},
+        "altitude": {"max": 10},
+        "distance": {"max": 20},
+        "mileage": {"total": 2500},
+        "takeOffLatitude": lat,
+        "takeOffLongitude": -70.4,
+    }
+
+
+def test_pipeline_en_memoria(monkeypatch, tmp_path):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"api_key": "k"}))
+
+    def fake_fetch(query, cfg, limite=None, cache=None):
+        vuelos = [_vuelo(1, -23.6, 3600, 3700), _vuelo(2, -33.4, 60, 90), _vuelo(3, -23.6, 90, 60)]
+        return vuelos, {"requested_range": (None, "2024-06-02 00:00:00"), "total": 3}
+
+    monkeypatch.setattr(ObtenerVuelos, "fetch_flights", fake_fetch)
+
+    pipeline = PipelineVuelos(
+        str(config),
+        str(tmp_path / "historico.parquet"),
+        str(tmp_path / "FlightsFinal.parquet"),
+        str(tmp_path / "quarantine"),
+        str(tmp_path / "grid.parquet"),
+    )
+    stats = pipeline.ejecutar()
+
+    assert stats["fetched"] == 3
+    assert stats["quarantined"] == 1
+    assert stats["validation"]["aire_mayor_log"] == 1
+    assert (stats["kept"], stats["discarded"]) == (1, 1)
+    assert not (tmp_path / "flights_api.parquet").exists()
+
+    final = pd.read_parquet(snapshot_actual(tmp_path / "FlightsFinal.parquet"))
+    assert list(final["Account"]) == ["default", "default"]
+    assert list(final["Air Hours"]) == [1.0, 0.02]
+    assert set(final["Equipo Piloto"]) == {"Pilotos Turno B"}
+    assert snapshot_actual(tmp_path / "grid.parquet") is not None
+
+
+def test_flatten_table_sin_participantes_y_valores_no_numericos():
+    vuelos = [_vuelo(1, "-23,5", 60, 90), _vuelo(2, "abc", 60, 90)]
+    for vuelo in vuelos:
+        vuelo["participants"] = {"data": []}
+        vuelo["takeOffLongitude"] = str(vuelo["takeOffLongitude"])
+
+    plano = flatten_table(pa.Table.from_pylist(vuelos), "a").to_pandas()
+
+    assert list(plano["Pilot-in-Command"]) == ["", ""]
+    assert plano["Latitude"].iloc[0] == -23.5
+    assert pd.isna(plano["Latitude"].iloc[1])    # llega a la regla sin_coordenadas
+    assert list(plano["Longitud"]) == [-70.4, -70.4]
+
+
+def test_cambio_a_cuentas_migra_historico_sin_duplicar(monkeypatch, tmp_path):
+    config = tmp_path / "config.json"
+    consultas = []
+
+    def fake_fetch(query, cfg, limite=None, cache=None):
+        consultas.append((cfg.get("name"), query["start"]))
+        vuelos = [_vuelo(1, -23.6, 60, 90)]
+        if cfg.get("name") == "a":
+            vuelos.append(_vuelo(2, -23.6, 60, 90))
+        return vuelos, {"requested_range": (None, "2024-06-02 00:00:00"), "total": len(vuelos)}
+
+    monkeypatch.setattr(ObtenerVuelos, "fetch_flights", fake_fetch)
+    rutas = [str(tmp_path / n) for n in ("historico.parquet", "FlightsFinal.parquet", "quarantine", "grid.parquet")]
+
+    # 1) Formato antiguo: un solo api_key
+    config.write_text(json.dumps({"api_key": "k"}))
+    PipelineVuelos(str(config), *rutas).ejecutar()
+
+    # 2) Cambio a `accounts`: la cuenta hereda el histórico y su marca de agua
+    config.write_text(json.dumps({"accounts": [{"name": "a", "api_key": "k"}]}))
+    PipelineVuelos(str(config), *rutas).ejecutar()
+
+    assert consultas[-1] == ("a", "2024-06-01 16:00:00")
+    assert snapshot_actual(tmp_path / "historico.parquet") is None
+    final = pd.read_parquet(tmp_path / "FlightsFinal.parquet")
+    assert sorted(final["Flight ID"]) == ["1", "2"]
@@ -1,5 +1,6 @@
 import pandas as pd
-from flights.services.Procesar import procesar_datos
+from flights.services.Procesar import descartar_existentes, procesar_datos
+from flights.services.Snapshots import snapshot_actual
 
 
 def test_procesar_datos_generates_parquet(tmp_path):
@@ -24,7 +25,7 @@ def test_procesar_datos_generates_parquet(tmp_path):
 
     procesar_datos(str(input_pq), str(output_pq))
 
-    result = pd.read_parquet(output_pq, engine="pyarrow")
+    result = pd.read_parquet(snapshot_actual(output_pq), engine="pyarrow")
     row = result.iloc[0]
 
     assert result.index.name == "ID"
@@ -35,3 +36,17 @@ def test_procesar_datos_generates_parquet(tmp_path):
     assert row["Km Recorridos"] == 1.5
     assert row["Equipo Piloto"] == "Pilotos Turno A"
     assert row["Turno"] == "Dia"
+
+
+def test_descartar_existentes_por_id_y_por_fecha_dron():
+    existente = pd.DataFrame({
+        "Flight/Service Date": pd.to_datetime(["2024-06-01 10:00", "2024-06-02 10:00"]),
+        "Drone Name": ["D1", "D1"],
+        "Flight ID": [None, "7"],                # fila antigua sin id + fila con id
+    })
+    nuevo = pd.DataFrame({
+        "Flight/Service Date": pd.to_datetime(["2024-06-01 10:00", "2024-06-03 10:00", "2024-06-04 10:00"]),
+        "Drone Name": ["D1", "D1", "D1"],
+        "Flight ID": ["5", "7", "8"],
+    })
+    assert list(descartar_existentes(nuevo, existente)["Flight ID"]) == ["8"]
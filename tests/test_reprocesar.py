@@ -0,0 +1,103 @@
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flights.services.ObtenerVuelos import account_raw_path, cuenta_legado
+from flights.services.Reprocesar import reprocesar
+from flights.services.Snapshots import bloqueo_exclusivo, publicar_snapshot, snapshot_actual
+
+
+def _raw(ids, pilot):
+    return pa.Table.from_pylist([
+        {
+            "id": i,
+            "time": "2024-06-01 16:00:00",
+            "timeISO": "2024-06-01T16:00:00Z",
+            "duration": {"airDuration": 60.0, "logDuration": 120.0},
+            "participants": {"data": [{"name": pilot, "role": "Pilot-in-Command"}]},
+            "batteryPercent": {"takeOff": 100.0, "landing": 80.0},
+            "takeOffLatitude": -23.0,
+            "takeOffLongitude": -69.0,
+        }
+        for i in ids
+    ])
+
+
+def test_reprocesar_reconstruye_final(tmp_path):
+    historico = tmp_path / "historico.parquet"
+    for cuenta, ids in (("a", range(5)), ("b", range(5, 8))):
+        tbl = _raw(ids, "Marcelo Crosgrover")
+        publicar_snapshot(
+            lambda d: pq.write_table(tbl, d, row_group_size=2),
+            account_raw_path(historico, cuenta),
+        )
+
+    final = tmp_path / "FlightsFinal.parquet"
+    stats = reprocesar(str(historico), str(final), workers=2)
+
+    assert stats["fragments"] == 5
+    assert stats["rows_in"] == stats["rows_out"] == 8
+    df = pd.read_parquet(snapshot_actual(final))
+    assert df.index.name == "ID"
+    assert list(df["Account"]) == ["a"] * 5 + ["b"] * 3
+    assert list(df.index) == list(range(8))
+    assert set(df["Equipo Piloto"]) == {"Pilotos Turno A"}
+
+
+def test_reprocesar_reagrupa_y_omite_repetidos(tmp_path):
+    historico = tmp_path / "historico.parquet"
+    # Histórico antiguo con un solo row group y un vuelo (id 4) repetido en la partición
+    legado = _raw(range(5), "Luciano Erazo")
+    publicar_snapshot(lambda d: pq.write_table(legado, d), historico)
+    particion = _raw(range(4, 7), "Luciano Erazo")
+    publicar_snapshot(lambda d: pq.write_table(particion, d), account_raw_path(historico, "b"))
+
+    final, grid = tmp_path / "FlightsFinal.parquet", tmp_path / "grid.parquet"
+    stats = reprocesar(str(historico), str(final), str(grid), workers=2, filas_por_grupo=2)
+
+    assert stats["fragments"] == 3 + 2                 # 5 filas y 3 filas en grupos de 2
+    assert pq.ParquetFile(snapshot_actual(historico)).num_row_groups == 3
+    assert stats["duplicates"] == 1
+    df = pd.read_parquet(snapshot_actual(final))
+    assert sorted(df["Flight ID"]) == [str(i) for i in range(7)]
+    assert list(df.index) == list(range(7))
+    assert pd.read_parquet(snapshot_actual(grid)).query("zoom == 6")["flights"].sum() == 7
+
+
+def test_reprocesar_espera_el_bloqueo_del_etl(tmp_path):
+    historico = tmp_path / "historico.parquet"
+    tbl = _raw(range(3), "Luciano Erazo")
+    publicar_snapshot(lambda d: pq.write_table(tbl, d), account_raw_path(historico, "a"))
+    final = tmp_path / "FlightsFinal.parquet"
+
+    hilo = threading.Thread(target=reprocesar, args=(str(historico), str(final)), kwargs={"workers": 1})
+    with bloqueo_exclusivo(final):                  # ETL en curso
+        hilo.start()
+        hilo.join(timeout=0.5)
+        assert hilo.is_alive()
+        assert snapshot_actual(final) is None       # nada publicado mientras tanto
+    hilo.join(timeout=30)
+    assert not hilo.is_alive()
+    assert len(pd.read_parquet(snapshot_actual(final))) == 3
+
+
+def test_reprocesar_migra_historico_legado_a_la_cuenta_del_etl(tmp_path):
+    historico = tmp_path / "historico.parquet"
+    legado = _raw(range(3), "Luciano Erazo")
+    publicar_snapshot(lambda d: pq.write_table(legado, d), historico)
+    particion = _raw(range(3, 5), "Luciano Erazo")
+    publicar_snapshot(lambda d: pq.write_table(particion, d), account_raw_path(historico, "b"))
+
+    cfg = {"name": "vieja", "accounts": [{"name": "a"}, {"name": "b"}]}
+    assert cuenta_legado(cfg) == "a"
+    assert cuenta_legado({**cfg, "legacy_account": "b"}) == "b"
+    assert cuenta_legado({"name": "vieja", "api_key": "k"}) is None
+
+    final = tmp_path / "FlightsFinal.parquet"
+    reprocesar(str(historico), str(final), workers=1,
+               default_account="vieja", legacy_account=cuenta_legado(cfg))
+
+    df = pd.read_parquet(snapshot_actual(final))
+    assert sorted(df["Account"]) == ["a"] * 3 + ["b"] * 2
+    assert snapshot_actual(historico) is None          # renombrado a *.migrado
+    assert len(pq.read_table(snapshot_actual(account_raw_path(historico, "a")))) == 3
@@ -0,0 +1,46 @@
+import json
+import os
+from datetime import timedelta
+from flights.services.Snapshots import (
+    limpiar_snapshots,
+    publicar_snapshot,
+    snapshot_actual,
+    snapshot_dir,
+)
+
+
+def _escribir(texto):
+    def escribir(destino):
+        with open(destino, "w") as f:
+            f.write(texto)
+    return escribir
+
+
+def test_publicar_snapshot_swap_y_retencion(tmp_path):
+    ruta = tmp_path / "FlightsFinal.parquet"
+    assert snapshot_actual(ruta) is None
+
+    # Formato antiguo: sin manifiesto se lee la ruta original
+    ruta.write_text("legacy")
+    assert snapshot_actual(ruta) == str(ruta)
+
+    v1 = publicar_snapshot(_escribir("v1"), ruta)
+    assert ruta.read_text() == "v1"               # la ruta lógica sigue al día
+    lector = open(snapshot_actual(ruta))          # lector abierto sobre v1
+    lector_logico = open(ruta)                    # lector de la ruta original (BI)
+    v2 = publicar_snapshot(_escribir("v2"), ruta)
+
+    assert snapshot_actual(ruta) == v2
+    assert lector.read() == "v1"                  # el lector no ve v2 a medias
+    assert lector_logico.read() == "v1"
+    assert ruta.read_text() == "v2"
+    lector.close()
+    lector_logico.close()
+    assert os.path.exists(v1)                     # dentro del periodo de retención
+
+    assert limpiar_snapshots(ruta, retencion=timedelta(0)) == [os.path.basename(v1)]
+    assert not os.path.exists(v1)
+    with open(os.path.join(snapshot_dir(ruta), "CURRENT.json")) as f:
+        assert json.load(f)["previous"] == []
+    assert open(snapshot_actual(ruta)).read() == "v2"
+    assert ruta.read_text() == "v2"               # el enlace sobrevive a la limpieza
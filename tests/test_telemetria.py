@@ -0,0 +1,93 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pyarrow as pa
+import pyarrow.dataset as ds
+from flights.services.Telemetria import fetch_telemetry
+
+
+def _csv(n):
+    filas = ["time(millisecond),latitude,longitude", "0,0,0"]
+    # trayectoria recta: la simplificación la reduce a sus extremos
+    filas += [f"{i * 100},{-23.0 + i * 1e-4},{-69.0 + i * 1e-4}" for i in range(n)]
+    return "\n".join(filas).encode()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Sustituto local de la API que sirve el CSV de telemetría."""
+
+    def do_GET(self):
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = _csv(50)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_fetch_telemetry_simplifies_and_partitions(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        tbl = pa.table({
+            "id": [1, 2, 3],
+            "time": ["2024-06-01 10:00:00", "2024-06-02 11:00:00", "2024-06-02 12:00:00"],
+            "csvLink": [f"{base}/csv/1", f"{base}/csv/2", f"{base}/missing"],
+        })
+        cfg = {"api_key": "k", "telemetry": {"workers": 2, "tolerance": 1e-6}}
+        stats = fetch_telemetry(tbl, cfg, str(tmp_path), account="a")
+    finally:
+        server.shutdown()
+
+    assert stats == {
+        "downloaded": 2, "failed": 1, "retried": 0, "pending": 1, "abandoned": 0,
+        "points_raw": 100, "points": 4,
+    }
+    tracks = ds.dataset(tmp_path, partitioning="hive").to_table().to_pylist()
+    assert sorted(t["id"] for t in tracks) == ["1", "2"]
+    assert all(len(t["lon"]) == 2 and t["points_raw"] == 50 for t in tracks)
+    particiones = sorted(p.name for p in tmp_path.iterdir() if not p.name.startswith("_"))
+    assert particiones == ["date=2024-06-01", "date=2024-06-02"]
+
+
+def test_fetch_telemetry_reintenta_fallidos(tmp_path):
+    caido = {"activo": True}
+
+    class Intermitente(StandInHandler):
+        def do_GET(self):
+            if caido["activo"]:
+                self.send_response(503)
+                self.end_headers()
+                return
+            super().do_GET()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Intermitente)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    cfg = {"api_key": "k", "telemetry": {"workers": 2, "max_attempts": 2}}
+    vacio = pa.table({"id": pa.array([], pa.int64()), "time": pa.array([], pa.string()),
+                      "csvLink": pa.array([], pa.string())})
+    try:
+        tbl = pa.table({
+            "id": [1, 2],
+            "time": ["2024-06-01 10:00:00", "2024-06-01 11:00:00"],
+            "csvLink": [f"{base}/csv/1", f"{base}/missing"],
+        })
+        # 1) La API falla: ambos quedan pendientes aunque la marca de agua ya avanzó
+        assert fetch_telemetry(tbl, cfg, str(tmp_path), account="a")["pending"] == 2
+
+        # 2) Siguiente ejecución sin vuelos nuevos: se reintentan los pendientes
+        caido["activo"] = False
+        stats = fetch_telemetry(vacio, cfg, str(tmp_path), account="a")
+    finally:
+        server.shutdown()
+
+    assert (stats["retried"], stats["downloaded"], stats["abandoned"], stats["pending"]) == (2, 1, 1, 0)
+    tracks = ds.dataset(tmp_path, partitioning="hive").to_table().to_pylist()
+    assert [t["id"] for t in tracks] == ["1"]
@@ -0,0 +1,42 @@
+import pandas as pd
+import pyarrow.dataset as ds
+from flights.services.Validar import validar_lote, guardar_cuarentena
+
+
+def test_validar_lote_separa_cuarentena(tmp_path):
+    df = pd.DataFrame({
+        "Flight/Service Date": [
+            "2024-06-01T16:00:00Z",
+            "2024-06-01T17:00:00Z",
+            "2024-06-01T18:00:00Z",
+            "2024-05-01T10:00:00Z",
+        ],
+        "Air Seconds": [60, 60, 300, 60],
+        "Air+Ground Seconds": [120, 120, 120, 120],
+        "Takeoff Bat %": [100, 50, 100, 100],
+        "Landing Bat %": [80, 70, 80, 80],
+        "Longitud": [-69.0, "", -69.0, -69.0],
+        "Latitude": [-23.0, -23.0, -23.0, -23.0],
+    })
+
+    validos, cuarentena, conteos = validar_lote(
+        df, ("2024-06-01 00:00:00", "2024-06-02 00:00:00")
+    )
+
+    assert len(validos) == 1
+    assert conteos == {
+        "sin_coordenadas": 1,
+        "bateria_negativa": 1,
+        "aire_mayor_log": 1,
+        "fecha_fuera_ventana": 1,
+    }
+    assert list(cuarentena["Motivo"]) == [
+        "sin_coordenadas;bateria_negativa",
+        "aire_mayor_log",
+        "fecha_fuera_ventana",
+    ]
+
+    guardar_cuarentena(cuarentena, str(tmp_path / "quarantine"))
+    guardado = ds.dataset(tmp_path / "quarantine").to_table().to_pandas()
+    assert len(guardado) == 3
+    assert "Fecha Cuarentena" in guardado.columns